@@ -1,7 +1,8 @@
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
-from uuid import uuid4
+import os
+import sys
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.tools.retriever import create_retriever_tool
@@ -24,6 +25,10 @@ from langgraph.prebuilt import ToolNode, tools_condition
 
 import streamlit as st
 
+# Content-addressed chunk ids are shared with the 07-agent-rag demos (rag_common/chunk_ids.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "07-agent-rag")))
+from rag_common.chunk_ids import upsert_new_documents
+
 st.set_page_config(page_title="AI Blog Search", page_icon=":mag_right:")
 st.header(":blue[Agentic RAG with LangGraph:] :green[AI Blog Search]")
 
@@ -300,8 +305,9 @@ def add_documents_to_qdrant(url, db):
             chunk_size=100, chunk_overlap=50
         )
         doc_chunks = text_splitter.split_documents(docs)
-        uuids = [str(uuid4()) for _ in range(len(doc_chunks))]
-        db.add_documents(documents=doc_chunks, ids=uuids)
+        # Identical chunks collapse onto one id; ids already in Qdrant are not re-embedded
+        stats = upsert_new_documents(db, doc_chunks)
+        st.caption(f"{stats['added']} new chunks embedded, {stats['skipped']} duplicates skipped")
         return True
     except Exception as e:
         st.error(f"Error adding documents: {str(e)}")
@@ -18,7 +18,8 @@ AI博客搜索系统 - 基于LangGraph的智能RAG应用
 # 导入必要的库和模块
 import streamlit as st  # Streamlit用于构建Web界面
 from typing import Annotated, Literal, Sequence, TypedDict  # 类型注解
-from uuid import uuid4  # 生成唯一标识符
+import os
+import sys
 from functools import partial  # 函数式编程工具
 
 # LangChain核心组件
@@ -48,6 +49,10 @@ from langgraph.prebuilt import tools_condition, ToolNode  # 预构建工具
 # LangChain Hub用于获取预定义提示模板
 from langchain import hub
 
+# 内容寻址的文档块 ID 与 07-agent-rag 的示例共用同一实现（rag_common/chunk_ids.py）
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "07-agent-rag")))
+from rag_common.chunk_ids import upsert_new_documents
+
 # 设置Streamlit页面配置
 st.set_page_config(
     page_title="AI博客智能搜索系统",  # 页面标题
@@ -525,8 +530,8 @@ def add_documents_to_qdrant(url, db):
     这个函数实现了完整的文档处理流程：
     1. 从URL加载网页内容
     2. 将长文档分割成小块
-    3. 为每个文档块生成唯一ID
-    4. 将文档块存储到向量数据库
+    3. 为每个文档块生成内容寻址的确定性ID
+    4. 只把向量数据库中尚不存在的文档块嵌入并存储（重复上传是幂等的）
     
     文档分块的重要性：
     - 提高检索精度：小块更容易匹配特定查询
@@ -555,15 +560,12 @@ def add_documents_to_qdrant(url, db):
         # 执行文档分割
         doc_chunks = text_splitter.split_documents(docs)
         
-        # 为每个文档块生成唯一标识符
-        # UUID确保每个文档块都有唯一的ID
-        uuids = [str(uuid4()) for _ in range(len(doc_chunks))]
-        
-        # 将文档块添加到向量数据库
-        # 这个过程包括：
+        # 为每个文档块生成确定性标识符（来源 + 内容哈希），相同内容的块合并为同一个ID；
+        # Qdrant 中已经存在的ID无需再次嵌入，只有新的文档块会：
         # 1. 使用嵌入模型将文本转换为向量
         # 2. 将向量和元数据存储到Qdrant
-        db.add_documents(documents=doc_chunks, ids=uuids)
+        stats = upsert_new_documents(db, doc_chunks)
+        st.caption(f"新嵌入 {stats['added']} 个文档块，跳过 {stats['skipped']} 个重复块")
         
         return True
         
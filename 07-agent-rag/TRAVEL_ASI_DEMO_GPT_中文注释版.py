@@ -50,6 +50,11 @@ import datetime
 import colab_env  # Google Colab环境支持
 
 from openai import OpenAI
+from rag_common.embedding_cache import get_default_cache  # 持久化嵌入缓存（跨运行、跨应用共享）
+from rag_common.context_packer import ScoredChunk, pack_context  # 按 token 预算打包检索上下文
+
+# 检索知识写入提示词的 token 上限（提示词越短，预填充越快）
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "1500"))
 
 # ==================== OpenAI客户端初始化 ====================
 """
@@ -78,9 +83,12 @@ def get_embedding(text, model="text-embedding-ada-002"):
     # 清理文本，移除换行符
     text = text.replace("\n", " ")
     
-    # 调用OpenAI API获取嵌入向量
-    response = client.embeddings.create(input=[text], model=model)
-    return response.data[0].embedding
+    # 先查持久化缓存，只有未命中的文本才调用OpenAI API获取嵌入向量
+    def compute(texts):
+        response = client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in response.data]
+
+    return get_default_cache().get_or_compute(f"openai/{model}", [text], compute)[0]
 
 # ==================== AI旅行代理类 ====================
 class Agent:
@@ -366,27 +374,30 @@ class Agent:
                 print(item)
             print("-" * 20)
 
-    def summarize_knowledge(self, knowledge_list):
+    def summarize_knowledge(self, knowledge_list, token_budget=KNOWLEDGE_TOKEN_BUDGET):
         """
         总结相关知识用于GPT-4提示词
         
         参数:
-            knowledge_list (list): 知识条目列表
+            knowledge_list (list): 知识条目列表（按检索顺序，可能包含重复条目）
+            token_budget (int): 知识摘要允许占用的最大 token 数
         
         返回:
             str: 格式化的知识摘要
         
         功能:
-        将检索到的知识转换为适合GPT-4理解的格式
+        将检索到的知识转换为适合GPT-4理解的格式；
+        每个兴趣都会检索 5 条知识，重复条目只保留一次，并按 token 预算截断，
+        输出顺序固定（按名称），相同的检索结果总能得到相同的提示词前缀
         """
         if not knowledge_list:
             return ""
         
-        summary = ""
-        for item in knowledge_list:
+        chunks = []
+        for rank, item in enumerate(knowledge_list):
             # 获取知识条目的名称
             name = list(item.keys())[0]
-            summary += f"**{name}**\n"
+            summary = f"**{name}**\n"
             summary += f"Description: {item.get('description', 'N/A')}\n"
             
             # 添加地址信息（如果有）
@@ -401,8 +412,13 @@ class Agent:
             if "tips" in item:
                 summary += "Tips:\n" + "\n".join(item['tips']) + "\n"
             
-            summary += "\n"
-        return summary
+            # 越早检索到的条目优先级越高
+            chunks.append(ScoredChunk(summary, -rank, name, 0))
+        
+        packed = pack_context(chunks, token_budget)
+        print(f"📦 知识上下文: {packed['kept']} 条, ~{packed['tokens']} tokens "
+              f"(未打包 ~{packed['tokens_unpacked']} tokens)")
+        return packed["text"] + "\n"
 
 # ==================== 纽约旅行知识库 ====================
 """
@@ -0,0 +1,115 @@
+# app/feedback_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LEGACY_LOG_FILE = "logs/feedback_log.json"
+
+
+class FeedbackStore:
+    """
+    Append-only feedback log backed by SQLite in WAL mode.
+
+    Each click is a single INSERT (no read-modify-write of the whole log), WAL lets
+    concurrent Streamlit sessions write while others read, and the indexes keep
+    filtered, paginated queries fast at hundreds of thousands of rows.
+    """
+
+    def __init__(self, path: str = "logs/feedback.sqlite", legacy_log_file: str = LEGACY_LOG_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                feedback TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback (created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_kind ON feedback (feedback, created)")
+        # Legacy files already imported, keyed by content hash (written with the imported rows)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS legacy_imports (digest TEXT PRIMARY KEY, imported REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._import_legacy(legacy_log_file)
+
+    def _import_legacy(self, legacy_log_file: str):
+        # One-off migration of the old JSON array log; the file is renamed so it is imported once
+        if not legacy_log_file or not os.path.exists(legacy_log_file):
+            return
+        try:
+            with open(legacy_log_file, "rb") as f:
+                raw = f.read()
+            entries = json.loads(raw)
+            rows = [(e.get("question", ""), e.get("answer", ""), e.get("feedback", "")) for e in entries]
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # A broken legacy log must not take the dashboard down; leave it in place and skip it
+            print(f"⚠️ Skipping legacy feedback import from {legacy_log_file}: {e}")
+            return
+
+        digest = hashlib.sha256(raw).hexdigest()
+        now = time.time()
+        with self._lock:
+            # Rows and marker commit together: a crash before the rename below re-finds the
+            # marker on the next start instead of importing the same rows again
+            with self._conn:
+                already = self._conn.execute(
+                    "SELECT 1 FROM legacy_imports WHERE digest = ?", (digest,)
+                ).fetchone()
+                if not already:
+                    self._conn.executemany(
+                        "INSERT INTO feedback (created, question, answer, feedback) VALUES (?, ?, ?, ?)",
+                        [(now, *row) for row in rows],
+                    )
+                    self._conn.execute("INSERT INTO legacy_imports (digest, imported) VALUES (?, ?)", (digest, now))
+        os.replace(legacy_log_file, legacy_log_file + ".imported")
+        if not already:
+            print(f"📥 Imported {len(rows)} legacy feedback entries")
+
+    def add(self, question: str, answer: str, feedback: str) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO feedback (created, question, answer, feedback) VALUES (?, ?, ?, ?)",
+                (time.time(), question, answer, feedback),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def count(self, feedback: str = None) -> int:
+        with self._lock:
+            if feedback:
+                row = self._conn.execute("SELECT COUNT(*) FROM feedback WHERE feedback = ?", (feedback,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()
+        return row[0]
+
+    def counts_by_feedback(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT feedback, COUNT(*) FROM feedback GROUP BY feedback").fetchall()
+        return dict(rows)
+
+    def page(self, offset: int = 0, limit: int = 50, feedback: str = None) -> list:
+        """Newest-first page of entries, optionally filtered by feedback value."""
+        query = "SELECT id, created, question, answer, feedback FROM feedback"
+        params = []
+        if feedback:
+            query += " WHERE feedback = ?"
+            params.append(feedback)
+        query += " ORDER BY created DESC, id DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"id": r[0], "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r[1])),
+             "question": r[2], "answer": r[3], "feedback": r[4]}
+            for r in rows
+        ]
@@ -1,18 +1,26 @@
 import streamlit as st
 import sys
 import os
-import json
 import pandas as pd
 
 # Add root to import path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from app.benchmark import benchmark_math_agent  # Add this import
+from app.benchmark import iter_benchmark_math_agent, latency_report, llm_usage_report
+from rag.llm_client import llm_metrics_snapshot
+from app.feedback_store import FeedbackStore
 from data.load_gsm8k_data import load_jeebench_dataset
-from rag.query_router import answer_math_question
+from rag.query_router import answer_math_question_stream
 
 st.set_page_config(page_title="Math Agent 🧮", layout="wide")
 st.title("🧠 Math Tutor Agent Dashboard")
 
+@st.cache_resource
+def get_feedback_store():
+    # One SQLite connection per process, shared by all sessions
+    return FeedbackStore()
+
+feedback_store = get_feedback_store()
+
 tab1, tab2, tab3 = st.tabs(["📘 Ask a Question", "📁 View Feedback", "📊 Benchmark Results"])
 
 # ---------------- TAB 1: Ask a Question ---------------- #
@@ -29,17 +37,24 @@ with tab1:
 
     user_question = st.text_input("Your Question:")
 
+    streamed = False
     if st.button("Get Answer"):
         if user_question:
-            with st.spinner("Thinking..."):
-                answer = answer_math_question(user_question)
+            # Stream tokens as they arrive; the output guardrail runs on the final buffer
+            st.markdown("### ✅ Answer:")
+            result, timings = {}, {}
+            st.write_stream(answer_math_question_stream(user_question, timings=timings, result=result))
+            if "first_token" in timings:
+                st.caption(f"⏱️ First token after {timings['first_token']:.2f}s")
             st.session_state["last_question"] = user_question
-            st.session_state["last_answer"] = answer
+            st.session_state["last_answer"] = result.get("answer", "")
             st.session_state["feedback_given"] = False
+            streamed = True
 
     if st.session_state["last_answer"]:
-        st.markdown("### ✅ Answer:")
-        st.success(st.session_state["last_answer"])
+        if not streamed:
+            st.markdown("### ✅ Answer:")
+            st.success(st.session_state["last_answer"])
 
         if not st.session_state["feedback_given"]:
             st.markdown("### 🙋 Was this helpful?")
@@ -62,19 +77,7 @@ with tab1:
                 }
 
                 try:
-                    os.makedirs("logs", exist_ok=True)
-                    log_file = "logs/feedback_log.json"
-
-                    if os.path.exists(log_file):
-                        with open(log_file, "r") as f:
-                            existing_logs = json.load(f)
-                    else:
-                        existing_logs = []
-
-                    existing_logs.append(log_entry)
-
-                    with open(log_file, "w") as f:
-                        json.dump(existing_logs, f, indent=2)
+                    feedback_store.add(log_entry["question"], log_entry["answer"], feedback)
 
                     st.success(f"✅ Feedback recorded as '{feedback}'")
                     st.write("📝 Log entry:", log_entry)
@@ -85,12 +88,31 @@ with tab1:
 with tab2:
     st.subheader("📁 View Collected Feedback")
     try:
-        with open("logs/feedback_log.json", "r") as f:
-            feedback_logs = json.load(f)
-        st.success("Loaded feedback log.")
-        st.dataframe(pd.DataFrame(feedback_logs))
+        counts = feedback_store.counts_by_feedback()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total", sum(counts.values()))
+        col2.metric("👍 Positive", counts.get("positive", 0))
+        col3.metric("👎 Negative", counts.get("negative", 0))
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            feedback_filter = st.selectbox("Filter", ["all", "positive", "negative"])
+        with col2:
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+        kind = None if feedback_filter == "all" else feedback_filter
+        total_rows = feedback_store.count(kind)
+        total_pages = max(1, -(-total_rows // page_size))
+        with col3:
+            page_number = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+
+        rows = feedback_store.page(offset=(page_number - 1) * page_size, limit=page_size, feedback=kind)
+        if rows:
+            st.caption(f"Page {page_number} of {total_pages} ({total_rows} entries)")
+            st.dataframe(pd.DataFrame(rows))
+        else:
+            st.info("No feedback collected yet.")
     except Exception as e:
-        st.warning("No feedback log found or error loading.")
+        st.warning("Error loading feedback log.")
         st.text(str(e))
 
 # ---------------- TAB 3: Benchmark Results ---------------- #
@@ -104,17 +126,39 @@ with tab3:
 
     num_questions = st.slider("Select number of math questions to benchmark", min_value=3, max_value=total_math, value=10)
 
+    max_workers = st.slider("Concurrent questions", min_value=1, max_value=16, value=4)
+    resume = st.checkbox("Resume from checkpoint", value=True)
+
     if st.button("▶️ Run Benchmark Now"):
-        with st.spinner(f"Benchmarking {num_questions} math questions..."):
-            df_result, accuracy = benchmark_math_agent(limit=num_questions)
-
-            # Save the result
-            os.makedirs("benchmark", exist_ok=True)
-            result_path = f"benchmark/results_math_{num_questions}.csv"
-            df_result.to_csv(result_path, index=False)
-
-            # Show result
-            st.success(f"✅ Done! Accuracy: {accuracy:.2f}%")
-            st.metric("Accuracy", f"{accuracy:.2f}%")
-            st.dataframe(df_result)
-            st.download_button("Download Results", data=df_result.to_csv(index=False), file_name=result_path, mime="text/csv")
\ No newline at end of file
+        progress = st.progress(0.0, text=f"Benchmarking {num_questions} math questions...")
+        metric_slot = st.empty()
+        table_slot = st.empty()
+
+        # Stream partial results as each question completes
+        llm_before = llm_metrics_snapshot()
+        results = []
+        for result in iter_benchmark_math_agent(limit=num_questions, max_workers=max_workers, resume=resume):
+            results.append(result)
+            df_partial = pd.DataFrame(results)
+            running_accuracy = df_partial["Correct"].mean() * 100
+            progress.progress(len(results) / num_questions, text=f"{len(results)}/{num_questions} done")
+            metric_slot.metric("Running Accuracy", f"{running_accuracy:.2f}%")
+            table_slot.dataframe(df_partial)
+
+        df_result = pd.DataFrame(results).sort_values("Index") if results else pd.DataFrame()
+        accuracy = df_result["Correct"].mean() * 100 if results else 0.0
+
+        # Save the result
+        os.makedirs("benchmark", exist_ok=True)
+        result_path = f"benchmark/results_math_{num_questions}.csv"
+        df_result.to_csv(result_path, index=False)
+
+        # Show result
+        st.success(f"✅ Done! Accuracy: {accuracy:.2f}%")
+        metric_slot.metric("Accuracy", f"{accuracy:.2f}%")
+        table_slot.dataframe(df_result)
+        st.markdown("#### ⏱️ Latency (seconds)")
+        st.dataframe(latency_report(df_result))
+        st.markdown("#### 🤖 LLM calls (shared client)")
+        st.dataframe(llm_usage_report(llm_before))
+        st.download_button("Download Results", data=df_result.to_csv(index=False), file_name=result_path, mime="text/csv")
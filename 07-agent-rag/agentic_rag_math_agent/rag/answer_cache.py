@@ -0,0 +1,264 @@
+# rag/answer_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    # Case, unicode width and whitespace differences should not miss the exact tier
+    text = unicodedata.normalize("NFKC", question).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+# Numbers, operators, function names and single-letter variables ("a"/"i" are English words)
+_MATH_TOKEN = re.compile(
+    r"\d+(?:\.\d+)?|[+\-*/^=<>≤≥≠√π∫]|\b(?:sin|cos|tan|cot|sec|csc|log|ln|exp|sqrt)\b"
+    r"|(?<![a-z'])[b-hj-z](?![a-z'])"
+)
+
+
+def math_signature(question: str) -> tuple:
+    """What must match exactly for two questions to share an answer: "2x+3=7" != "2x+5=7"."""
+    return tuple(_MATH_TOKEN.findall(normalize_question(question)))
+
+
+# Near-duplicate pairs for calibrating ANSWER_CACHE_SIMILARITY (`python rag/answer_cache.py`).
+# Paraphrases should hit the semantic tier; the variants have different answers and must not.
+PARAPHRASE_PAIRS = [
+    ("What is the Pythagorean theorem?", "Can you explain the Pythagorean theorem?"),
+    ("What is the formula for the area of a circle?", "How do I find the area of a circle?"),
+    ("What is the derivative of x^2?", "Differentiate x^2"),
+    ("Explain the chain rule in calculus.", "How does the chain rule work in calculus?"),
+    ("What is the difference between mean and median?", "How are mean and median different?"),
+    ("Solve 2x + 3 = 7", "solve 2x+3=7 step by step"),
+]
+VARIANT_PAIRS = [
+    ("Solve 2x + 3 = 7", "Solve 2x + 5 = 7"),
+    ("What is the derivative of x^2?", "What is the derivative of x^3?"),
+    ("What is 12 * 7?", "What is 12 * 8?"),
+    ("Find the area of a circle with radius 3", "Find the area of a circle with radius 4"),
+    ("What is the integral of sin(x)?", "What is the integral of cos(x)?"),
+    ("What is the volume of a sphere?", "What is the surface area of a sphere?"),
+]
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache persisted in SQLite.
+
+    Tier 1 is an exact match on the normalized question hash, tier 2 an embedding
+    cosine-similarity lookup above `similarity_threshold` that is only served when
+    both questions have the same numbers, operators and variables
+    (`math_signature`). Entries live in a
+    `namespace` (model + prompt version), expire after `ttl_sec` and the least
+    recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, namespace: str, embed_fn=None, similarity_threshold: float = 0.97,
+                 max_entries: int = 5000, ttl_sec: float = 7 * 24 * 3600):
+        self.namespace = namespace
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "signature_rejects": 0, "misses": 0}
+
+        self._lock = threading.Lock()
+        self._pending_vecs = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                namespace TEXT NOT NULL,
+                qhash TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, qhash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_lru ON answers (namespace, last_access)")
+        self._conn.commit()
+        self._purge_expired()
+        self._load_vectors()
+
+    # ---------- internal helpers ---------- #
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_sec
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (cutoff,))
+            self._conn.commit()
+
+    def _load_vectors(self):
+        # Semantic tier is searched in memory; SQLite is only the persistent copy
+        rows = self._conn.execute(
+            "SELECT qhash, question, embedding FROM answers WHERE namespace = ? AND embedding IS NOT NULL",
+            (self.namespace,),
+        ).fetchall()
+        self._hashes = [qhash for qhash, _, _ in rows]
+        self._signatures = [math_signature(question) for _, question, _ in rows]
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+        else:
+            self._matrix = None
+
+    def _embed(self, question: str):
+        vec = np.asarray(self.embed_fn(normalize_question(question)), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _touch(self, qhash: str):
+        self._conn.execute(
+            "UPDATE answers SET last_access = ? WHERE namespace = ? AND qhash = ?",
+            (time.time(), self.namespace, qhash),
+        )
+        self._conn.commit()
+
+    def _fetch(self, qhash: str):
+        row = self._conn.execute(
+            "SELECT answer, created FROM answers WHERE namespace = ? AND qhash = ?",
+            (self.namespace, qhash),
+        ).fetchone()
+        if row is None:
+            return None
+        answer, created = row
+        if time.time() - created > self.ttl_sec:
+            self._delete(qhash)
+            return None
+        self._touch(qhash)
+        return answer
+
+    def _delete(self, qhash: str):
+        self._conn.execute("DELETE FROM answers WHERE namespace = ? AND qhash = ?", (self.namespace, qhash))
+        self._conn.commit()
+        if qhash in self._hashes:
+            pos = self._hashes.index(qhash)
+            del self._hashes[pos]
+            del self._signatures[pos]
+            self._matrix = np.delete(self._matrix, pos, axis=0) if self._hashes else None
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM answers WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        victims = self._conn.execute(
+            "SELECT qhash FROM answers WHERE namespace = ? ORDER BY last_access ASC LIMIT ?",
+            (self.namespace, overflow),
+        ).fetchall()
+        for (qhash,) in victims:
+            self._delete(qhash)
+
+    # ---------- public API ---------- #
+    def get(self, question: str):
+        """Return (answer, tier) where tier is 'exact' or 'semantic', or (None, None) on a miss."""
+        qhash = question_hash(question)
+        with self._lock:
+            answer = self._fetch(qhash)
+            if answer is not None:
+                self.stats["exact_hits"] += 1
+                return answer, "exact"
+            has_vectors = self._matrix is not None
+
+        if self.embed_fn is not None:
+            # Embed outside the lock; the vector is kept so a following put() doesn't re-embed
+            query_vec = self._embed(question)
+            with self._lock:
+                if len(self._pending_vecs) > 256:
+                    self._pending_vecs.clear()
+                self._pending_vecs[qhash] = query_vec
+                if has_vectors and self._matrix is not None:
+                    scores = self._matrix @ query_vec
+                    signature = math_signature(question)
+                    # Best-scoring neighbour above the threshold that asks about the same numbers
+                    for pos in np.argsort(-scores):
+                        if scores[pos] < self.similarity_threshold:
+                            break
+                        if self._signatures[pos] != signature:
+                            self.stats["signature_rejects"] += 1
+                            continue
+                        answer = self._fetch(self._hashes[pos])
+                        if answer is not None:
+                            self.stats["semantic_hits"] += 1
+                            print(f"♻️ Semantic cache hit (cosine={scores[pos]:.3f})")
+                            return answer, "semantic"
+                        break
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def put(self, question: str, answer: str):
+        qhash = question_hash(question)
+        vec = None
+        if self.embed_fn is not None:
+            with self._lock:
+                vec = self._pending_vecs.pop(qhash, None)
+            if vec is None:
+                vec = self._embed(question)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, qhash, question, answer,
+                 vec.tobytes() if vec is not None else None, now, now),
+            )
+            self._conn.commit()
+            if vec is not None and qhash not in self._hashes:
+                self._hashes.append(qhash)
+                self._signatures.append(math_signature(question))
+                self._matrix = vec[None, :] if self._matrix is None else np.vstack([self._matrix, vec])
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+            self._hashes = []
+            self._signatures = []
+            self._matrix = None
+
+
+def calibrate_threshold(embed_fn, paraphrases=PARAPHRASE_PAIRS, variants=VARIANT_PAIRS) -> dict:
+    """Cosine scores of the calibration pairs under `embed_fn`, and how many variants the signature check stops."""
+    def cosine(a, b):
+        va, vb = (np.asarray(embed_fn(normalize_question(q)), dtype=np.float32) for q in (a, b))
+        return float(va @ vb / (np.linalg.norm(va) * np.linalg.norm(vb)))
+
+    paraphrase_scores = [cosine(a, b) for a, b in paraphrases]
+    variant_scores = [cosine(a, b) for a, b in variants]
+    # Variants with equal signatures are only kept apart by the threshold
+    unguarded = [score for (a, b), score in zip(variants, variant_scores) if math_signature(a) == math_signature(b)]
+    return {
+        "paraphrase_min": min(paraphrase_scores),
+        "paraphrase_mean": sum(paraphrase_scores) / len(paraphrase_scores),
+        "variant_max": max(variant_scores),
+        "variants_stopped_by_signature": len(variants) - len(unguarded),
+        "unguarded_variant_max": max(unguarded) if unguarded else None,
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    load_dotenv("config/.env")
+    embed = OpenAIEmbedding(api_key=os.getenv("OPENAI_API_KEY"), model="text-embedding-ada-002")
+    report = calibrate_threshold(embed.get_query_embedding)
+    print("📏 Semantic cache calibration (text-embedding-ada-002)")
+    for key, value in report.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+    print("  ANSWER_CACHE_SIMILARITY should sit above unguarded_variant_max and, ideally, below paraphrase_min")
@@ -0,0 +1,9 @@
+# rag/config.py
+import os
+
+from dotenv import load_dotenv
+
+# ✅ Single source for settings shared by the router, guardrails and the LLM client
+load_dotenv("config/.env")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+LLM_MODEL = "gpt-4o"
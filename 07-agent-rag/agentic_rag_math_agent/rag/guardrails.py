@@ -1,14 +1,12 @@
 import dspy
-import os
-from dotenv import load_dotenv
+from rag.math_classifier import INPUT_EXAMPLES, FastMathClassifier
+from rag.config import LLM_MODEL, OPENAI_API_KEY
+from rag.llm_client import get_dspy_lm, track_dspy_call
 
-# Load API key
-load_dotenv("config/.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 print("🔐 Loaded OPENAI_API_KEY:", "✅ Found" if OPENAI_API_KEY else "❌ Missing")
 
-# Configure LM
-lm = dspy.LM(model="gpt-4o", api_key=OPENAI_API_KEY)
+# Configure LM (shared with the router's connection pool, see rag/llm_client.py)
+lm = get_dspy_lm(LLM_MODEL)
 dspy.configure(lm=lm)
 
 # ✅ Signature for Input Guard
@@ -26,54 +24,28 @@ class ClassifyMath(dspy.Signature):
 
 # ✅ Input Validator
 class InputValidator(dspy.Module):
-    def __init__(self):
+    def __init__(self, use_fast_path: bool = True):
         super().__init__()
         self.classifier = dspy.Predict(ClassifyMath)
+        # Local pre-classifier: confident Yes/No skip the LLM round trip
+        self.fast_path = FastMathClassifier() if use_fast_path else None
+        self.stats = {"fast_path": 0, "llm": 0}
         self.validate_question = dspy.ChainOfThought(
             ClassifyMath,
-            examples=[
-                {"question": "What is the derivative of x^2?", "verdict": "Yes"},
-                {"question": "Explain the chain rule in calculus.", "verdict": "Yes"},
-                {"question": "Why do I need to learn algebra?", "verdict": "Yes"},
-                {"question": "What is the Pythagorean theorem?", "verdict": "Yes"},
-                {"question": "How do I solve a quadratic equation?", "verdict": "Yes"},
-                {"question": "What is the area of a circle?", "verdict": "Yes"},
-                {"question": "How is math used in real life?", "verdict": "Yes"},
-                {"question": "What is the purpose of trigonometry?", "verdict": "Yes"},
-                {"question": "What is the Fibonacci sequence?", "verdict": "Yes"},
-                {"question": "can you tell me about rhombus?", "verdict": "Yes"},
-                {"question": "what is a circle?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a circle?", "verdict": "Yes"},
-                {"question": "What is the formula for the circumference of a circle?", "verdict": "Yes"},
-                {"question": "What is the formula for the volume of a cone?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a parallelogram?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a trapezoid?", "verdict": "Yes"},
-                {"question": "What is the formula for the surface area of a cube?", "verdict": "Yes"},
-                {"question": "What is the area of parallelogram?", "verdict": "Yes"},
-                {"question": "What is a square?", "verdict": "Yes"},
-                {"question": "Explain rectangle?", "verdict": "Yes"},
-                {"question": "can you tell me about pentagon?", "verdict": "Yes"},
-                {"question": "What is the formula for the volume of a sphere?", "verdict": "Yes"},
-                {"question": "What is the difference between a mean and median?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a triangle?", "verdict": "Yes"},
-                {"question": "What is the difference between a permutation and a combination?", "verdict": "Yes"},
-                {"question": "What is the formula for the slope of a line?", "verdict": "Yes"},
-                {"question": "What is the difference between a rational and irrational number?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a rectangle?", "verdict": "Yes"},
-                {"question": "What is the formula for the volume of a cylinder?", "verdict": "Yes"},
-                {"question": "What is the formula for the area of a trapezoid?", "verdict": "Yes"},
-                {"question": "What is the formula for the surface area of a sphere?", "verdict": "Yes"},
-                {"question": "What is the formula for the surface area of a cylinder?", "verdict": "Yes"},
-                {"question": "What is the integral of sin(x)?", "verdict": "Yes"},
-                {"question": "What is the difference between mean and median?", "verdict": "Yes"},
-                {"question": "What is the formula for the circumference of a circle?", "verdict": "Yes"},
-                {"question": "What is the quadratic formula?", "verdict": "Yes"},   
-                {"question": "Tell me a good movie to watch.", "verdict": "No"},
-                {"question": "What is AI?", "verdict": "No"},
-            ]
+            examples=INPUT_EXAMPLES
         )
     def forward(self, question):
-        response = self.classifier(question=question)
+        if self.fast_path is not None:
+            verdict = self.fast_path.predict(question)
+            if verdict is not None:
+                self.stats["fast_path"] += 1
+                print("⚡ InputValidator Fast Path:", verdict)
+                return verdict == "Yes"
+
+        self.stats["llm"] += 1
+        with track_dspy_call("input_guardrail") as call:
+            response = self.classifier(question=question)
+            call["prediction"] = response
         print("🧠 InputValidator Response:", response.verdict)
         return response.verdict.lower().strip() == "yes"
 
@@ -90,10 +62,12 @@ class OutputValidator(dspy.Module):
         self.validate_answer = dspy.Predict(self.ValidateAnswer)
 
     def forward(self, question, answer):
-        response = self.validate_answer(
-            question=question,
-            answer=answer
-        )
+        with track_dspy_call("output_guardrail") as call:
+            response = self.validate_answer(
+                question=question,
+                answer=answer
+            )
+            call["prediction"] = response
         print("🧠 OutputValidator Response:", response.verdict)
         return response.verdict.lower().strip() == "yes"
 
@@ -0,0 +1,97 @@
+# rag/kb_index.py
+import os
+import sys
+import threading
+import time
+
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+from rag_common.embedding_cache import CachedLlamaIndexEmbedding
+
+QDRANT_HOST = "localhost"
+QDRANT_PORT = 6333
+COLLECTION_NAME = "math_agent"
+PERSIST_DIR = "storage"
+# Touched by vector.py::build_vector_index after every rebuild, so other processes notice
+VERSION_FILE = os.path.join(PERSIST_DIR, "kb_version")
+
+_lock = threading.Lock()
+_index = None
+_retrievers = {}
+_loaded_version = None
+
+# ✅ Load / reuse timings (cold start should be paid once per process)
+kb_timings = {
+    "loads": 0,
+    "reuses": 0,
+    "last_load_sec": None,
+    "total_load_sec": 0.0,
+    "last_reuse_sec": None,
+}
+
+
+def _current_version():
+    try:
+        return os.path.getmtime(VERSION_FILE)
+    except OSError:
+        return None
+
+
+def load_kb_index():
+    """Build a fresh index handle from Qdrant + the persisted storage dir (uncached)."""
+    qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    vector_store = QdrantVectorStore(client=qdrant_client, collection_name=COLLECTION_NAME)
+    storage_context = StorageContext.from_defaults(persist_dir=PERSIST_DIR, vector_store=vector_store)
+    # Repeated questions reuse their query embedding from the persistent cache
+    embed_model = CachedLlamaIndexEmbedding(OpenAIEmbedding(api_key=os.getenv("OPENAI_API_KEY")))
+    return load_index_from_storage(storage_context, embed_model=embed_model)
+
+
+def get_kb_retriever(similarity_top_k: int = 1):
+    """Return the process-wide retriever, building the index lazily on first use."""
+    global _index, _loaded_version
+    start = time.perf_counter()
+    version = _current_version()
+
+    retriever = _retrievers.get(similarity_top_k)
+    if retriever is not None and version == _loaded_version:
+        kb_timings["reuses"] += 1
+        kb_timings["last_reuse_sec"] = time.perf_counter() - start
+        return retriever
+
+    with _lock:
+        # Another thread may have finished loading while we waited on the lock
+        if _index is None or version != _loaded_version:
+            _retrievers.clear()
+            _index = load_kb_index()
+            _loaded_version = version
+            elapsed = time.perf_counter() - start
+            kb_timings["loads"] += 1
+            kb_timings["last_load_sec"] = elapsed
+            kb_timings["total_load_sec"] += elapsed
+            print(f"📚 KB index loaded in {elapsed:.2f}s")
+        if similarity_top_k not in _retrievers:
+            _retrievers[similarity_top_k] = _index.as_retriever(similarity_top_k=similarity_top_k)
+        return _retrievers[similarity_top_k]
+
+
+def invalidate_kb_index():
+    """Drop the cached index so the next query reloads it (call after rebuilding the collection)."""
+    global _index, _loaded_version
+    with _lock:
+        _index = None
+        _loaded_version = None
+        _retrievers.clear()
+
+
+def mark_kb_rebuilt():
+    """Record a rebuild so cached handles in this and other processes are refreshed."""
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    with open(VERSION_FILE, "w") as f:
+        f.write(str(time.time()))
+    invalidate_kb_index()
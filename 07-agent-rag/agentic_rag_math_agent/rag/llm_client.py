@@ -0,0 +1,168 @@
+# rag/llm_client.py
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import httpx
+from rag.config import LLM_MODEL, OPENAI_API_KEY
+from rag_common.context_packer import count_tokens
+
+# ✅ One keep-alive connection pool for every LLM call in the process (router, guardrails, benchmark)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "60"))
+
+_lock = threading.Lock()
+_http_client = None
+_llms = {}
+_dspy_lms = {}
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# ✅ Per-caller metrics: calls, wall time and token usage
+llm_metrics = {}
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=httpx.Timeout(LLM_TIMEOUT_SEC, connect=5.0),
+                limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2,
+                                    max_keepalive_connections=LLM_MAX_CONCURRENCY),
+            )
+        return _http_client
+
+
+def get_llm(model: str = LLM_MODEL):
+    """Process-wide llama-index OpenAI LLM for `model`, sharing the pooled HTTP client."""
+    from llama_index.llms.openai import OpenAI
+
+    http_client = get_http_client()
+    with _lock:
+        if model not in _llms:
+            _llms[model] = OpenAI(api_key=OPENAI_API_KEY, model=model, http_client=http_client)
+        return _llms[model]
+
+
+def get_dspy_lm(model: str = LLM_MODEL):
+    """Process-wide DSPy LM; litellm reuses the same pooled HTTP client."""
+    import dspy
+    import litellm
+
+    http_client = get_http_client()
+    with _lock:
+        litellm.client_session = http_client
+        if model not in _dspy_lms:
+            _dspy_lms[model] = dspy.LM(model=model, api_key=OPENAI_API_KEY)
+        return _dspy_lms[model]
+
+
+def _record(caller: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+    with _lock:
+        m = llm_metrics.setdefault(caller, {"calls": 0, "total_sec": 0.0, "max_sec": 0.0,
+                                            "prompt_tokens": 0, "completion_tokens": 0})
+        m["calls"] += 1
+        m["total_sec"] += seconds
+        m["max_sec"] = max(m["max_sec"], seconds)
+        m["prompt_tokens"] += prompt_tokens
+        m["completion_tokens"] += completion_tokens
+
+
+def _usage(raw):
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def complete(prompt: str, caller: str = "generation", model: str = LLM_MODEL) -> str:
+    with _semaphore:
+        start = time.perf_counter()
+        response = get_llm(model).complete(prompt)
+        seconds = time.perf_counter() - start
+    usage = _usage(response.raw) or (count_tokens(prompt), count_tokens(response.text))
+    _record(caller, seconds, *usage)
+    return response.text
+
+
+def stream_complete(prompt: str, caller: str = "generation", model: str = LLM_MODEL):
+    """
+    Yield text deltas; the concurrency slot is held while streaming.
+
+    The slot is released in `finally`, which also runs when a consumer stops early
+    and the generator is closed (explicitly, or when it is garbage collected).
+    """
+    chunks = []
+    _semaphore.acquire()
+    start = time.perf_counter()
+    try:
+        for response in get_llm(model).stream_complete(prompt):
+            if response.delta:
+                chunks.append(response.delta)
+                yield response.delta
+    finally:
+        _semaphore.release()
+        # Streaming responses carry no usage block, so count locally
+        _record(caller, time.perf_counter() - start, count_tokens(prompt), count_tokens("".join(chunks)))
+
+
+def _prediction_usage(prediction):
+    """Token usage DSPy attached to this prediction (needs track_usage; cache hits report none)."""
+    get_lm_usage = getattr(prediction, "get_lm_usage", None)
+    usage = (get_lm_usage() if get_lm_usage else None) or {}
+    prompt_tokens = sum(u.get("prompt_tokens") or 0 for u in usage.values())
+    completion_tokens = sum(u.get("completion_tokens") or 0 for u in usage.values())
+    return prompt_tokens, completion_tokens
+
+
+@contextmanager
+def track_dspy_call(caller: str):
+    """
+    Record latency/tokens of one DSPy call; set `call["prediction"]` inside the block.
+
+    Usage is read from the call's own prediction, not from the LM's shared history,
+    so concurrent calls (benchmark workers) don't count each other's tokens.
+    """
+    import dspy
+
+    call = {"prediction": None}
+    with _semaphore:
+        start = time.perf_counter()
+        try:
+            with dspy.context(track_usage=True):
+                yield call
+        finally:
+            seconds = time.perf_counter() - start
+            _record(caller, seconds, *_prediction_usage(call["prediction"]))
+
+
+def llm_metrics_snapshot() -> dict:
+    with _lock:
+        return {caller: dict(m) for caller, m in llm_metrics.items()}
+
+
+def llm_metrics_report(before: dict = None) -> list:
+    """Rows per caller (optionally the delta since `before`) with mean latency and tokens."""
+    before = before or {}
+    rows = []
+    for caller, m in llm_metrics_snapshot().items():
+        prev = before.get(caller, {})
+        calls = m["calls"] - prev.get("calls", 0)
+        if calls <= 0:
+            continue
+        total_sec = m["total_sec"] - prev.get("total_sec", 0.0)
+        rows.append({
+            "Caller": caller,
+            "Calls": calls,
+            "MeanSec": round(total_sec / calls, 2),
+            "PromptTokens": m["prompt_tokens"] - prev.get("prompt_tokens", 0),
+            "CompletionTokens": m["completion_tokens"] - prev.get("completion_tokens", 0),
+        })
+    return rows
@@ -0,0 +1,231 @@
+# rag/math_classifier.py
+import math
+import re
+import time
+from collections import Counter
+
+# ✅ Labelled examples shared by the DSPy input guard and the local fast path
+INPUT_EXAMPLES = [
+    {"question": "What is the derivative of x^2?", "verdict": "Yes"},
+    {"question": "Explain the chain rule in calculus.", "verdict": "Yes"},
+    {"question": "Why do I need to learn algebra?", "verdict": "Yes"},
+    {"question": "What is the Pythagorean theorem?", "verdict": "Yes"},
+    {"question": "How do I solve a quadratic equation?", "verdict": "Yes"},
+    {"question": "What is the area of a circle?", "verdict": "Yes"},
+    {"question": "How is math used in real life?", "verdict": "Yes"},
+    {"question": "What is the purpose of trigonometry?", "verdict": "Yes"},
+    {"question": "What is the Fibonacci sequence?", "verdict": "Yes"},
+    {"question": "can you tell me about rhombus?", "verdict": "Yes"},
+    {"question": "what is a circle?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a circle?", "verdict": "Yes"},
+    {"question": "What is the formula for the circumference of a circle?", "verdict": "Yes"},
+    {"question": "What is the formula for the volume of a cone?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a parallelogram?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a trapezoid?", "verdict": "Yes"},
+    {"question": "What is the formula for the surface area of a cube?", "verdict": "Yes"},
+    {"question": "What is the area of parallelogram?", "verdict": "Yes"},
+    {"question": "What is a square?", "verdict": "Yes"},
+    {"question": "Explain rectangle?", "verdict": "Yes"},
+    {"question": "can you tell me about pentagon?", "verdict": "Yes"},
+    {"question": "What is the formula for the volume of a sphere?", "verdict": "Yes"},
+    {"question": "What is the difference between a mean and median?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a triangle?", "verdict": "Yes"},
+    {"question": "What is the difference between a permutation and a combination?", "verdict": "Yes"},
+    {"question": "What is the formula for the slope of a line?", "verdict": "Yes"},
+    {"question": "What is the difference between a rational and irrational number?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a rectangle?", "verdict": "Yes"},
+    {"question": "What is the formula for the volume of a cylinder?", "verdict": "Yes"},
+    {"question": "What is the formula for the area of a trapezoid?", "verdict": "Yes"},
+    {"question": "What is the formula for the surface area of a sphere?", "verdict": "Yes"},
+    {"question": "What is the formula for the surface area of a cylinder?", "verdict": "Yes"},
+    {"question": "What is the integral of sin(x)?", "verdict": "Yes"},
+    {"question": "What is the difference between mean and median?", "verdict": "Yes"},
+    {"question": "What is the formula for the circumference of a circle?", "verdict": "Yes"},
+    {"question": "What is the quadratic formula?", "verdict": "Yes"},
+    {"question": "Tell me a good movie to watch.", "verdict": "No"},
+    {"question": "What is AI?", "verdict": "No"},
+]
+
+# ✅ Real off-topic questions, many with numbers or math-sounding words, so the fast path's
+# false accepts are measured and its "No" side has more than two examples to compare against
+OFF_TOPIC_EXAMPLES = [
+    {"question": "Recommend a 5-star hotel in Paris.", "verdict": "No"},
+    {"question": "Who played Neo in The Matrix?", "verdict": "No"},
+    {"question": "What is the probability it rains tomorrow?", "verdict": "No"},
+    {"question": "What is the median household income in Texas?", "verdict": "No"},
+    {"question": "Plan a 2-3 day trip to Rome.", "verdict": "No"},
+    {"question": "What is the area code for Chicago?", "verdict": "No"},
+    {"question": "How many calories are in a slice of pizza?", "verdict": "No"},
+    {"question": "Who won the 2018 World Cup?", "verdict": "No"},
+    {"question": "What time is it in Tokyo right now?", "verdict": "No"},
+    {"question": "Write a poem about the ocean.", "verdict": "No"},
+    {"question": "How do I reset my Wi-Fi router?", "verdict": "No"},
+    {"question": "What is the capital of Australia?", "verdict": "No"},
+    {"question": "Is a 4x4 truck good for snow?", "verdict": "No"},
+    {"question": "Translate 'good morning' into Spanish.", "verdict": "No"},
+    {"question": "What are the symptoms of the flu?", "verdict": "No"},
+    {"question": "Which vector database should I use for my startup?", "verdict": "No"},
+    {"question": "Suggest a movie for a 24/7 streaming marathon.", "verdict": "No"},
+    {"question": "What is the mean temperature in London in July?", "verdict": "No"},
+    {"question": "Tell me about the history of the Roman Empire.", "verdict": "No"},
+    {"question": "How do I cook rice in 10-15 minutes?", "verdict": "No"},
+    {"question": "How do I run an A/B test on my landing page?", "verdict": "No"},
+    {"question": "Is the I/O speed of this SSD good?", "verdict": "No"},
+    {"question": "What is the P/E ratio of Apple stock?", "verdict": "No"},
+    {"question": "Is 4K + HDR worth it?", "verdict": "No"},
+    {"question": "Best restaurants in Rome w/o reservations", "verdict": "No"},
+    {"question": "Should I take vitamin b-12 or vitamin d+ supplements?", "verdict": "No"},
+    {"question": "Is a 2-4x zoom lens enough for wildlife photos?", "verdict": "No"},
+]
+
+# Unambiguous math syntax the fast path may accept without the LLM
+SYNTAX_EXAMPLES = [
+    {"question": "Solve 2x + 3 = 7", "verdict": "Yes"},
+    {"question": "Differentiate x^3 - 4x", "verdict": "Yes"},
+    {"question": "What is ∫ x dx?", "verdict": "Yes"},
+    {"question": "Find dy/dx if y = 3x^2", "verdict": "Yes"},
+    {"question": "Simplify (a + b)^2", "verdict": "Yes"},
+    {"question": "If x = 5, what is 3x - 2?", "verdict": "Yes"},
+]
+
+# Terms that on their own make a question mathematical
+STRONG_TERMS = {
+    "math", "maths", "mathematics", "mathematical", "algebra", "calculus", "geometry", "trigonometry",
+    "arithmetic", "derivative", "derivatives", "differentiate", "differentiation", "integral", "integrals",
+    "integrate", "integration", "theorem", "equation", "equations", "quadratic", "polynomial", "polynomials",
+    "logarithm", "logarithms", "matrix", "matrices", "determinant", "eigenvalue", "eigenvalues", "vector",
+    "vectors", "permutation", "permutations", "probability", "fibonacci", "parallelogram", "trapezoid",
+    "rhombus", "pentagon", "hexagon", "polygon", "circumference", "hypotenuse", "pythagorean", "irrational",
+    "factorial", "binomial", "asymptote", "parabola", "hyperbola", "ellipse", "sine", "cosine", "tangent",
+    "median", "variance", "inequality", "inequalities", "fraction", "fractions", "denominator", "numerator",
+}
+# Terms that are mathematical in most, but not all, contexts ("square", "mean", "volume" ...)
+WEAK_TERMS = {
+    "area", "volume", "circle", "triangle", "square", "rectangle", "cube", "sphere", "cylinder", "cone",
+    "slope", "line", "angle", "radius", "diameter", "perimeter", "mean", "average", "mode", "sequence",
+    "series", "formula", "number", "numbers", "prime", "rational", "ratio", "percentage", "percent",
+    "sum", "product", "solve", "calculate", "compute", "simplify", "evaluate", "graph", "function",
+    "limit", "root", "roots", "combination", "combinations", "surface", "sin", "cos", "tan", "log",
+}
+# Only syntax that is math in any context: equations, operators between a variable and a number
+# or a longer expression, powers, math glyphs and function notation. Case-sensitive, so only
+# lowercase single-letter variables count: "A/B test", "I/O", "P/E", "4K + HDR" don't qualify,
+# and neither do "w/o", "5-star", "2-3 days" or "24/7".
+_NUMBER = r"\d+(?:\.\d+)?(?![a-z\d])"                                     # 3, 2.5 (not "60fps")
+_NO_WORD = r"(?!\s*[A-Za-z])"                                            # "10 + a bonus" is prose
+SYMBOL_PATTERN = re.compile(
+    r"(?:\d|\b[a-z]\b|\))\s*(?:=|≤|≥|≠)\s*[\-(]?\s*(?:\d|\b[a-z]\b)"      # 2x + 3 = 7, x = 5
+    r"|\b\d+[a-z]\s*[\+\-\*/]\s*(?:" + _NUMBER + r"|\d*[a-z]\b|\()"         # 2x + 3, 2x - y
+    r"|(?:\d|\))\s*[\+\-\*/]\s*\d+[a-z]\b(?=\s*(?:[\+\-\*/=^)?]|$))"        # 3 - 4x
+    r"|\b[a-z]\s*[\+\*]\s*" + _NUMBER + _NO_WORD +                          # x + 1, x*3
+    r"|\d\s*[\+\*]\s*[a-z]\b" + _NO_WORD +                                   # 3 + x, 2*y
+    r"|[(=]\s*[a-z]\s*[\+\-\*]\s*[a-z]\b" + _NO_WORD +                        # (a + b, = a - b
+    r"|\b[a-z]\s*[\+\-\*]\s*[a-z]\s*[\+\-\*/=^)]"                              # a + b = c, a*b + c
+    r"|\d\s*[\+\*]\s*\d"                                                     # 3 + 4, 12*7 ("-" and "/" are also ranges and dates)
+    r"|[a-z0-9)]\s*\^\s*\d"                                                  # x^2, (a + b)^2
+    r"|[∫∑∏√π∞≤≥≠±÷∂θ]"                                                   # math glyphs
+    r"|\b(?:sin|cos|tan|log|ln|exp)\s*\("                                 # sin(x)
+    r"|\bd[a-z]/d[a-z]\b"                                                # dy/dx
+)
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+
+def _tokens(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class FastMathClassifier:
+    """
+    Local pre-classifier for the input guard.
+
+    `predict` returns "Yes" or "No" when confident, and None when the question
+    should be escalated to the LLM classifier. It says "Yes" on unambiguous math
+    syntax, or on a near-paraphrase of a labelled math question that also uses two
+    or more math terms; a single keyword ("probability", "median") is not enough.
+    It says "No" only for questions with no math vocabulary that closely match an
+    off-topic example.
+    """
+
+    def __init__(self, examples=None, yes_threshold: float = 0.75, no_threshold: float = 0.75):
+        self.examples = INPUT_EXAMPLES + OFF_TOPIC_EXAMPLES if examples is None else examples
+        self.yes_threshold = yes_threshold
+        self.no_threshold = no_threshold
+
+        docs = [_tokens(ex["question"]) for ex in self.examples]
+        df = Counter(tok for doc in docs for tok in set(doc))
+        n = len(docs)
+        self.idf = {tok: math.log((1 + n) / (1 + cnt)) + 1.0 for tok, cnt in df.items()}
+        self.default_idf = math.log(1 + n) + 1.0
+        self.vectors = [(self._vectorize(doc), ex["verdict"]) for doc, ex in zip(docs, self.examples)]
+
+    def _vectorize(self, tokens):
+        tf = Counter(tokens)
+        vec = {tok: cnt * self.idf.get(tok, self.default_idf) for tok, cnt in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {tok: v / norm for tok, v in vec.items()}
+
+    def _best_similarity(self, vec, verdict):
+        best = 0.0
+        for other, label in self.vectors:
+            if label != verdict:
+                continue
+            best = max(best, sum(v * other.get(tok, 0.0) for tok, v in vec.items()))
+        return best
+
+    def predict(self, question: str):
+        if SYMBOL_PATTERN.search(question):
+            return "Yes"
+
+        tokens = _tokens(question)
+        math_hits = sum(1 for tok in set(tokens) if tok in STRONG_TERMS or tok in WEAK_TERMS)
+        vec = self._vectorize(tokens)
+        yes_similarity = self._best_similarity(vec, "Yes")
+        if math_hits >= 2 and yes_similarity >= self.yes_threshold:
+            return "Yes"
+        no_similarity = self._best_similarity(vec, "No")
+        if math_hits == 0 and no_similarity >= self.no_threshold and no_similarity > yes_similarity:
+            return "No"
+        # Keyword-only or ambiguous questions go to the LLM classifier
+        return None
+
+
+def evaluate_fast_path(examples=None):
+    """Leave-one-out accuracy, coverage, false accepts and latency of the fast path."""
+    examples = INPUT_EXAMPLES + OFF_TOPIC_EXAMPLES + SYNTAX_EXAMPLES if examples is None else examples
+    decided = correct = false_accepts = false_rejects = 0
+    latencies = []
+    for i, ex in enumerate(examples):
+        # Hold the example out so TF-IDF similarity can't simply recall it
+        classifier = FastMathClassifier(examples[:i] + examples[i + 1:])
+        start = time.perf_counter()
+        verdict = classifier.predict(ex["question"])
+        latencies.append(time.perf_counter() - start)
+        if verdict is not None:
+            decided += 1
+            correct += verdict == ex["verdict"]
+            false_accepts += verdict == "Yes" and ex["verdict"] == "No"
+            false_rejects += verdict == "No" and ex["verdict"] == "Yes"
+
+    latencies.sort()
+    total = len(examples)
+    negatives = sum(ex["verdict"] == "No" for ex in examples)
+    return {
+        "examples": total,
+        "off_topic_examples": negatives,
+        "short_circuited": decided,
+        "coverage": decided / total if total else 0.0,
+        "accuracy_on_short_circuited": correct / decided if decided else 0.0,
+        "false_accepts": false_accepts,
+        "false_accept_rate": false_accepts / negatives if negatives else 0.0,
+        "false_rejects": false_rejects,
+        "escalated_to_llm": total - decided,
+        "p50_latency_ms": latencies[total // 2] * 1000 if total else 0.0,
+        "max_latency_ms": latencies[-1] * 1000 if total else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    report = evaluate_fast_path()
+    print("📊 Fast-path input guard report (leave-one-out on math, off-topic and syntax examples)")
+    for key, value in report.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
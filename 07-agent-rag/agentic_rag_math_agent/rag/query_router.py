@@ -2,40 +2,97 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 
 import os
-import requests
 import openai  
 import json
 import inspect
-from llama_index.core import StorageContext,load_index_from_storage
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
 from dotenv import load_dotenv
-from llama_index.vector_stores.qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
 from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
 from rag.guardrails import OutputValidator, InputValidator
+from rag.kb_index import get_kb_retriever
+from rag.answer_cache import AnswerCache
+from rag.web_search import search_web
+from rag import llm_client
+from rag.config import LLM_MODEL, OPENAI_API_KEY
+from rag_common.context_packer import truncate_to_tokens
+from rag_common.embedding_cache import CachedLlamaIndexEmbedding
 
 # Load environment variables
 load_dotenv("config/.env")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+
+EMBED_MODEL = "text-embedding-ada-002"
+# ✅ Upper bound on retrieved KB / web text pasted into a prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
 
 # Load DSPy guardrails
 output_validator = OutputValidator()
 input_validator = InputValidator()
 
-def load_kb_index():
-    qdrant_client = QdrantClient(host="localhost", port=6333)
-    vector_store = QdrantVectorStore(client=qdrant_client, collection_name="math_agent")
-    storage_context = StorageContext.from_defaults(persist_dir="storage",vector_store=vector_store)
-    index = load_index_from_storage(storage_context)
-    return index
+WEB_EXPLAIN_PROMPT = """
+You are a friendly and precise math tutor.
+
+The student asked: "{question}"
+
+Below is some information retrieved from the web. If it's helpful, use it to explain the answer. If it's incorrect or irrelevant, ignore it and instead explain the answer accurately based on your own math knowledge.
+
+Web Content:
+\"\"\"
+{web_content}
+\"\"\"
+
+Now write a clear, accurate, and step-by-step explanation of the student's question.
+Only include valid math steps — do not guess or make up answers.
+"""
+
+KB_EXPLAIN_PROMPT = """
+You are a helpful math tutor.
+
+Here is a student's question:
+\"\"\"
+{question}
+\"\"\"
+
+And here is the correct answer retrieved from a trusted academic knowledge base:
+\"\"\"
+{kb_answer}
+\"\"\"
+
+Your job is to explain to the student step-by-step **why** this is the correct answer.
+Do not change the final answer. You are only allowed to explain what is already given.
+
+Use the KB content as your only source. Do not guess or recalculate.
+"""
+
+# ✅ Answer cache: any change to the model or either prompt moves to a fresh namespace
+PROMPT_VERSION = hashlib.sha256((WEB_EXPLAIN_PROMPT + KB_EXPLAIN_PROMPT).encode("utf-8")).hexdigest()[:12]
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+answer_cache = AnswerCache(
+    path=os.getenv("ANSWER_CACHE_PATH", "cache/answer_cache.sqlite"),
+    namespace=f"{LLM_MODEL}:{EMBED_MODEL}:{PROMPT_VERSION}",
+    embed_fn=CachedLlamaIndexEmbedding(OpenAIEmbedding(api_key=OPENAI_API_KEY, model=EMBED_MODEL)).get_query_embedding,
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000")),
+    ttl_sec=float(os.getenv("ANSWER_CACHE_TTL_SEC", str(7 * 24 * 3600))),
+) if ANSWER_CACHE_ENABLED else None
+
+# ✅ Speculative execution: retrieval (and optionally the web fallback) starts while the input guard runs
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+SPECULATIVE_WEB = os.getenv("SPECULATIVE_WEB", "false").lower() == "true"
+_speculative_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATIVE_WORKERS", "8")),
+                                       thread_name_prefix="speculative")
 
 def query_kb(question: str):
-    index = load_kb_index()
-    nodes = index.as_retriever(similarity_top_k=1).retrieve(question)
+    # Index + retriever are built once per process and reused (see rag/kb_index.py)
+    retriever = get_kb_retriever(similarity_top_k=1)
+    nodes = retriever.retrieve(question)
     if not nodes:
         return "I'm not sure.", 0.0
 
@@ -49,99 +106,232 @@ def query_kb(question: str):
     return matched_text, similarity
 
 def query_web(question: str):
-    url = "https://api.tavily.com/search"
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "api_key": TAVILY_API_KEY,
-        "query": question,
-        "search_depth": "basic",
-        "include_answer": True,
-        "include_raw_content": False
-    }
-    response = requests.post(url, json=payload, headers=headers)
-    data = response.json()
-    return data.get("answer", "No answer found.")
+    # Async Tavily call on a pooled client with timeouts / optional hedging (see rag/web_search.py).
+    # Memoized per question, so the output-guard retry reuses the first fallback's result.
+    return search_web(question)
 
-def explain_with_openai(question: str, web_content: str):
-    prompt = f"""
-You are a friendly and precise math tutor.
+def _complete(prompt: str) -> str:
+    # Shared long-lived client: keep-alive, concurrency limit and metrics (see rag/llm_client.py)
+    return llm_client.complete(prompt, caller="generation", model=LLM_MODEL)
 
-The student asked: "{question}"
 
-Below is some information retrieved from the web. If it's helpful, use it to explain the answer. If it's incorrect or irrelevant, ignore it and instead explain the answer accurately based on your own math knowledge.
+def _stream_complete(prompt: str):
+    yield from llm_client.stream_complete(prompt, caller="generation", model=LLM_MODEL)
 
-Web Content:
-\"\"\"
-{web_content}
-\"\"\"
 
-Now write a clear, accurate, and step-by-step explanation of the student's question.
-Only include valid math steps — do not guess or make up answers.
-"""
-    llm = OpenAI(api_key=OPENAI_API_KEY, model="gpt-4o")
-    response = llm.complete(prompt)
-    return response.text
+def explain_with_openai(question: str, web_content: str):
+    prompt = WEB_EXPLAIN_PROMPT.format(question=question, web_content=web_content)
+    return _complete(prompt)
 
 
-def answer_math_question(question: str):
-    print(f"🔍 Query: {question}")
+def _run_timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
 
-    if not input_validator.forward(question):
-        return "⚠️ This assistant only answers math-related academic questions."
 
-    answer = ""
-    from_kb = False
+@contextmanager
+def _timed(timings: dict, stage: str):
+    # Accumulate per-stage wall time (a stage may run twice, e.g. the web retry)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _web_explain_prompt(question: str, timings: dict, web_future=None):
+    if web_future is not None:
+        web_content, web_sec = web_future.result()
+        timings["web_search"] = timings.get("web_search", 0.0) + web_sec
+    else:
+        with _timed(timings, "web_search"):
+            web_content = query_web(question)
+    return WEB_EXPLAIN_PROMPT.format(question=question,
+                                     web_content=truncate_to_tokens(web_content, CONTEXT_TOKEN_BUDGET))
+
+
+def _cancel_speculative(*futures):
+    """Discard speculative work: cancel if still queued, otherwise ignore its result."""
+    for future in futures:
+        if future is not None:
+            future.cancel()
+
+
+def _prepare_answer(question: str, timings: dict, use_cache: bool, speculative: bool):
+    """
+    Cache lookup, input guard and retrieval shared by the blocking and streaming paths.
+
+    Returns (answer, None, None) when no generation is needed (cache hit or rejected
+    question), otherwise (None, prompt, from_kb).
+    """
+    if use_cache:
+        try:
+            with _timed(timings, "cache_lookup"):
+                cached, tier = answer_cache.get(question)
+            if cached is not None:
+                print(f"♻️ Answer served from {tier} cache")
+                return cached, None, None
+        except Exception as e:
+            print("⚠️ Answer cache lookup failed:", e)
+
+    kb_future = web_future = None
+    if speculative:
+        kb_future = _speculative_pool.submit(_run_timed, query_kb, question)
+        if SPECULATIVE_WEB:
+            web_future = _speculative_pool.submit(_run_timed, query_web, question)
+    critical_start = time.perf_counter()
+
+    try:
+        with _timed(timings, "input_guardrail"):
+            is_math = input_validator.forward(question)
+    except Exception:
+        # Don't leave speculative work holding pool workers for a request that failed
+        _cancel_speculative(kb_future, web_future)
+        raise
+    if not is_math:
+        _cancel_speculative(kb_future, web_future)
+        return "⚠️ This assistant only answers math-related academic questions.", None, None
 
     try:
-        kb_answer, similarity = query_kb(question)
+        if kb_future is not None:
+            (kb_answer, similarity), retrieval_sec = kb_future.result()
+            timings["retrieval"] = timings.get("retrieval", 0.0) + retrieval_sec
+            # Sequential cost would have been guardrail + retrieval; we only waited for the slower one
+            critical_sec = time.perf_counter() - critical_start
+            timings["speculative_saved"] = max(0.0, timings["input_guardrail"] + retrieval_sec - critical_sec)
+            print(f"⏱️ Speculative retrieval saved {timings['speculative_saved']:.2f}s")
+        else:
+            with _timed(timings, "retrieval"):
+                kb_answer, similarity = query_kb(question)
         print("🧪 KB raw answer:", kb_answer)
 
         if similarity > 0.:
             print("✅ High similarity KB match, using GPT for step-by-step explanation...")
+            kb_answer = truncate_to_tokens(kb_answer, CONTEXT_TOKEN_BUDGET)
+            return None, KB_EXPLAIN_PROMPT.format(question=question, kb_answer=kb_answer), True
+        raise ValueError("Low similarity match or empty")
 
-            prompt = f"""
-You are a helpful math tutor.
+    except Exception as e:
+        print("⚠️ Using Web fallback because:", e)
+        return None, _web_explain_prompt(question, timings, web_future), False
 
-Here is a student's question:
-\"\"\"
-{question}
-\"\"\"
 
-And here is the correct answer retrieved from a trusted academic knowledge base:
-\"\"\"
-{kb_answer}
-\"\"\"
+def _cache_answer(question: str, answer: str, use_cache: bool):
+    if use_cache:
+        try:
+            answer_cache.put(question, answer)
+        except Exception as e:
+            print("⚠️ Answer cache write failed:", e)
 
-Your job is to explain to the student step-by-step **why** this is the correct answer.
-Do not change the final answer. You are only allowed to explain what is already given.
 
-Use the KB content as your only source. Do not guess or recalculate.
-"""
+def answer_math_question(question: str, timings: dict = None, use_cache: bool = True,
+                         speculative: bool = SPECULATIVE_RETRIEVAL):
+    """Answer a math question; if `timings` is given it is filled with per-stage seconds."""
+    timings = {} if timings is None else timings
+    print(f"🔍 Query: {question}")
+    use_cache = use_cache and answer_cache is not None
 
-            llm = OpenAI(api_key=OPENAI_API_KEY, model="gpt-4o")
-            answer = llm.complete(prompt).text
-            from_kb = True
-        else:
-            raise ValueError("Low similarity match or empty")
+    answer, prompt, from_kb = _prepare_answer(question, timings, use_cache, speculative)
+    if prompt is None:
+        return answer
 
+    try:
+        with _timed(timings, "generation"):
+            answer = _complete(prompt)
     except Exception as e:
+        if not from_kb:
+            raise
         print("⚠️ Using Web fallback because:", e)
-        web_content = query_web(question)
-        answer = explain_with_openai(question, web_content)
+        prompt = _web_explain_prompt(question, timings)
+        with _timed(timings, "generation"):
+            answer = _complete(prompt)
         from_kb = False
 
     print(f"📦 Answer Source: {'KB' if from_kb else 'Web'}")
 
     # Final Output Guardrail Check
-    if not output_validator.forward(question, answer):
+    with _timed(timings, "output_guardrail"):
+        is_valid = output_validator.forward(question, answer)
+    if not is_valid:
         print("⚠️ Final answer failed validation — retrying with web content...")
 
-        web_content = query_web(question)
-        answer = explain_with_openai(question, web_content)
+        prompt = _web_explain_prompt(question, timings)
+        with _timed(timings, "generation"):
+            answer = _complete(prompt)
         from_kb = False
 
+    _cache_answer(question, answer, use_cache)
     return answer
 
+
+def answer_math_question_stream(question: str, timings: dict = None, result: dict = None,
+                                use_cache: bool = True, speculative: bool = SPECULATIVE_RETRIEVAL):
+    """
+    Streaming variant of `answer_math_question` that yields text chunks as they arrive.
+
+    The output guardrail runs on the final buffer, after the tokens have been shown; if it
+    fails, a revised web-based explanation is streamed after a separator. `result["answer"]`
+    holds the final answer and `timings["first_token"]` the time-to-first-token.
+    """
+    timings = {} if timings is None else timings
+    result = {} if result is None else result
+    print(f"🔍 Query (stream): {question}")
+    use_cache = use_cache and answer_cache is not None
+    request_start = time.perf_counter()
+
+    answer, prompt, from_kb = _prepare_answer(question, timings, use_cache, speculative)
+    if prompt is None:
+        timings["first_token"] = time.perf_counter() - request_start
+        result["answer"] = answer
+        yield answer
+        return
+
+    chunks = []
+    try:
+        # closing(): an abandoned stream gives its LLM concurrency slot back immediately
+        with _timed(timings, "generation"), closing(_stream_complete(prompt)) as stream:
+            for delta in stream:
+                if not chunks:
+                    timings["first_token"] = time.perf_counter() - request_start
+                    print(f"⏱️ Time to first token: {timings['first_token']:.2f}s")
+                chunks.append(delta)
+                yield delta
+    except Exception as e:
+        # Only fall back if nothing has been shown yet
+        if chunks or not from_kb:
+            raise
+        print("⚠️ Using Web fallback because:", e)
+        prompt = _web_explain_prompt(question, timings)
+        with _timed(timings, "generation"), closing(_stream_complete(prompt)) as stream:
+            for delta in stream:
+                if not chunks:
+                    timings["first_token"] = time.perf_counter() - request_start
+                chunks.append(delta)
+                yield delta
+        from_kb = False
+    answer = "".join(chunks)
+
+    print(f"📦 Answer Source: {'KB' if from_kb else 'Web'}")
+
+    # Final Output Guardrail Check on the complete buffer
+    with _timed(timings, "output_guardrail"):
+        is_valid = output_validator.forward(question, answer)
+    if not is_valid:
+        print("⚠️ Final answer failed validation — retrying with web content...")
+        yield "\n\n---\n\n⚠️ The explanation above did not pass validation. Revised explanation:\n\n"
+
+        prompt = _web_explain_prompt(question, timings)
+        chunks = []
+        with _timed(timings, "generation"), closing(_stream_complete(prompt)) as stream:
+            for delta in stream:
+                chunks.append(delta)
+                yield delta
+        answer = "".join(chunks)
+
+    result["answer"] = answer
+    _cache_answer(question, answer, use_cache)
+
 if __name__ == "__main__":
     question = """
 In a historical experiment to determine Planck's constant, a metal surface was irradiated with light of different wavelengths.
@@ -1,53 +1,139 @@
-from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.core.schema import Document
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import Document, MetadataMode
 from llama_index.core.node_parser import SimpleNodeParser
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 from llama_index.embeddings.openai import OpenAIEmbedding
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import PointIdsList
 from dotenv import load_dotenv
 import pandas as pd
-import os
+from rag.kb_index import QDRANT_HOST, QDRANT_PORT, COLLECTION_NAME, PERSIST_DIR, mark_kb_rebuilt
+from rag_common.chunk_ids import find_existing_ids
+from rag_common.embedding_cache import CachedLlamaIndexEmbedding, get_default_cache
+from rag_common.qdrant_profile import ensure_collection, get_profile
 
 # ✅ Load environment variables
 load_dotenv("config/.env")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# ✅ Load JEEBench dataset as Documents
+JEEBENCH_URL = "hf://datasets/daman1209arora/jeebench/test.json"
+JEEBENCH_CACHE = "cache/jeebench_test.json"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Fixed namespace so the same content always maps to the same Qdrant point id
+NODE_ID_NAMESPACE = uuid.UUID("6f1c2b1e-6d4a-4c1e-9a55-7b1f0d0c9e21")
+
+# ✅ Load JEEBench dataset as Documents (downloaded once, then read from the local copy)
 def load_jeebench_documents():
-    df = pd.read_json("hf://datasets/daman1209arora/jeebench/test.json")
+    if os.path.exists(JEEBENCH_CACHE):
+        df = pd.read_json(JEEBENCH_CACHE)
+    else:
+        df = pd.read_json(JEEBENCH_URL)
+        os.makedirs(os.path.dirname(JEEBENCH_CACHE), exist_ok=True)
+        df.to_json(JEEBENCH_CACHE)
+
     documents = []
-    for i, row in df.iterrows():
-        q = row["question"]
-        a = row["gold"]
+    for i, (q, a) in enumerate(zip(df["question"], df["gold"])):
         text = f"Q: {q}\nA: {a}"
-        doc = Document(text=text, metadata={"source": "jee_bench", "index": i})
+        doc = Document(id_=f"jee_bench_{i}", text=text, metadata={"source": "jee_bench", "index": i})
         documents.append(doc)
     return documents
 
-# ✅ Build the vector index using Qdrant
-def build_vector_index():
+# ✅ Content-addressed node ids: unchanged text => unchanged id => no re-embedding
+def assign_content_ids(nodes):
+    for node in nodes:
+        content = node.get_content(metadata_mode=MetadataMode.EMBED)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        node.id_ = str(uuid.uuid5(NODE_ID_NAMESPACE, digest))
+    return nodes
+
+# ✅ Points whose id is not a current node id: removed/changed content, or uuid4 ids from
+# indexes built before content addressing. Left in place they would duplicate every answer.
+def delete_stale_points(qdrant_client, collection_name, keep_ids, batch_size=1024):
+    stale, offset = [], None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        stale.extend(p.id for p in points if str(p.id) not in keep_ids)
+        if offset is None:
+            break
+    for start in range(0, len(stale), batch_size):
+        qdrant_client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=stale[start:start + batch_size]),
+        )
+    return len(stale)
+
+def _embed_batch(embed_model, batch):
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+    return batch, embed_model.get_text_embedding_batch(texts)
+
+# ✅ Build the vector index using Qdrant (incremental and resumable)
+def build_vector_index(batch_size: int = EMBED_BATCH_SIZE, max_workers: int = EMBED_CONCURRENCY):
     documents = load_jeebench_documents()
 
     node_parser = SimpleNodeParser()
-    nodes = node_parser.get_nodes_from_documents(documents)
+    nodes = assign_content_ids(node_parser.get_nodes_from_documents(documents))
+    # Identical chunks collapse onto one point
+    nodes = list({node.node_id: node for node in nodes}.values())
 
-    qdrant_client = QdrantClient(host="localhost", port=6333)
-    collection_name = "math_agent"
+    qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    collection_name = COLLECTION_NAME
 
-    if not qdrant_client.collection_exists(collection_name=collection_name):
-        qdrant_client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
-        )
+    # ✅ Vector layout (float32 / int8 scalar / binary quantization, on-disk originals) from QDRANT_PROFILE
+    if ensure_collection(qdrant_client, collection_name, size=1536):
+        print(f"📚 Created collection {collection_name} ({get_profile()['name']} profile)")
+
+    # Qdrant is the checkpoint: every finished batch is upserted immediately, so a crashed
+    # run resumes by skipping the points that already exist
+    node_ids = [node.node_id for node in nodes]
+    stale = delete_stale_points(qdrant_client, collection_name, set(node_ids))
+    existing = find_existing_ids(qdrant_client, collection_name, node_ids)
+    pending = [node for node in nodes if node.node_id not in existing]
+    print(f"📦 {len(nodes)} nodes, {len(existing)} already embedded, {len(pending)} to embed, "
+          f"{stale} stale points deleted")
 
     vector_store = QdrantVectorStore(client=qdrant_client, collection_name=collection_name)
-    embed_model = OpenAIEmbedding(api_key=OPENAI_API_KEY)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    # Persistent cache: re-ingesting after a collection reset doesn't pay for embeddings again
+    embed_model = CachedLlamaIndexEmbedding(OpenAIEmbedding(api_key=OPENAI_API_KEY))
+
+    if pending:
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        done = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_embed_batch, embed_model, batch) for batch in batches]
+            # Upserts happen on this thread only, as each batch finishes embedding
+            for future in as_completed(futures):
+                batch, embeddings = future.result()
+                for node, embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+                vector_store.add(batch)
+                done += len(batch)
+                print(f"  ↳ upserted {done}/{len(pending)}")
+
+    index_store_missing = not os.path.exists(os.path.join(PERSIST_DIR, "index_store.json"))
+    if pending or stale or index_store_missing:
+        index = VectorStoreIndex.from_vector_store(vector_store=vector_store, embed_model=embed_model)
+        index.storage_context.persist(persist_dir=PERSIST_DIR)
 
-    index = VectorStoreIndex(nodes=nodes, embed_model=embed_model, storage_context=storage_context)
-    index.storage_context.persist()
+        # ✅ Invalidate cached KB handles (this process + running routers via the version file)
+        mark_kb_rebuilt()
 
+    print(f"♻️ Embedding cache: {get_default_cache().stats()}")
     print("✅ Qdrant vector index built and saved successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# rag/web_search.py
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv("config/.env")
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+TAVILY_URL = "https://api.tavily.com/search"
+NO_ANSWER = "No answer found."
+
+# ✅ Strict timeouts: a slow search degrades to "no web content" instead of hanging the request
+WEB_CONNECT_TIMEOUT_SEC = float(os.getenv("WEB_CONNECT_TIMEOUT_SEC", "3"))
+WEB_TIMEOUT_SEC = float(os.getenv("WEB_TIMEOUT_SEC", "10"))
+# ✅ Hedging: fire a second identical request if the first is slower than the observed p95
+WEB_HEDGE_ENABLED = os.getenv("WEB_HEDGE_ENABLED", "false").lower() == "true"
+WEB_HEDGE_DELAY_SEC = float(os.getenv("WEB_HEDGE_DELAY_SEC", "2.0"))  # used until enough samples exist
+WEB_HEDGE_MIN_SAMPLES = 20
+# ✅ Memo: the output-guard retry (and concurrent identical questions) reuse the first result
+WEB_MEMO_TTL_SEC = float(os.getenv("WEB_MEMO_TTL_SEC", "600"))
+WEB_MEMO_MAX_ENTRIES = 256
+
+_latencies = deque(maxlen=200)
+web_stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "memo_hits": 0}
+
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _get_loop():
+    """One event loop thread per process; it owns the pooled async HTTP client."""
+    global _loop, _client
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="web-search-loop", daemon=True).start()
+            _client = httpx.AsyncClient(
+                timeout=httpx.Timeout(WEB_TIMEOUT_SEC, connect=WEB_CONNECT_TIMEOUT_SEC),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+            _loop = loop
+        return _loop
+
+
+def hedge_delay() -> float:
+    if len(_latencies) < WEB_HEDGE_MIN_SAMPLES:
+        return WEB_HEDGE_DELAY_SEC
+    ordered = sorted(_latencies)
+    return ordered[int(len(ordered) * 0.95) - 1]
+
+
+async def _search_once(question: str) -> str:
+    start = time.perf_counter()
+    payload = {
+        "api_key": TAVILY_API_KEY,
+        "query": question,
+        "search_depth": "basic",
+        "include_answer": True,
+        "include_raw_content": False
+    }
+    response = await _client.post(TAVILY_URL, json=payload)
+    response.raise_for_status()
+    _latencies.append(time.perf_counter() - start)
+    return response.json().get("answer") or NO_ANSWER
+
+
+async def _search(question: str, hedge: bool) -> str:
+    web_stats["requests"] += 1
+    primary = asyncio.ensure_future(_search_once(question))
+    tasks = [primary]
+    try:
+        if hedge:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay())
+            if not done:
+                web_stats["hedged"] += 1
+                tasks.append(asyncio.ensure_future(_search_once(question)))
+        # First successful response wins; a failed one only matters if all fail
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=WEB_TIMEOUT_SEC,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        web_stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _run(question: str, hedge: bool) -> Future:
+    return asyncio.run_coroutine_threadsafe(_search(question, hedge), _get_loop())
+
+
+def search_web_future(question: str, hedge: bool = None) -> Future:
+    """Start (or join) the web search for `question`; memoized for WEB_MEMO_TTL_SEC."""
+    hedge = WEB_HEDGE_ENABLED if hedge is None else hedge
+    now = time.time()
+    with _memo_lock:
+        entry = _memo.get(question)
+        if entry is not None and now - entry[0] < WEB_MEMO_TTL_SEC:
+            future = entry[1]
+            # Never serve a failed search from the memo
+            if not (future.done() and future.exception() is not None):
+                _memo.move_to_end(question)
+                web_stats["memo_hits"] += 1
+                return future
+        future = _run(question, hedge)
+        _memo[question] = (now, future)
+        while len(_memo) > WEB_MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+        return future
+
+
+def search_web(question: str, hedge: bool = None) -> str:
+    """Blocking wrapper; timeouts and HTTP errors degrade to NO_ANSWER."""
+    try:
+        # Small margin over the per-attempt timeout for the hedge delay
+        return search_web_future(question, hedge).result(timeout=2 * WEB_TIMEOUT_SEC + WEB_HEDGE_DELAY_SEC)
+    except Exception as e:
+        web_stats["timeouts"] += isinstance(e, (TimeoutError, asyncio.TimeoutError, httpx.TimeoutException))
+        print(f"⚠️ Web search failed: {type(e).__name__}: {e}")
+        return NO_ANSWER
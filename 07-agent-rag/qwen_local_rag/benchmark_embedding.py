@@ -0,0 +1,56 @@
+"""
+Compare chunk embedding throughput against a local Ollama server.
+
+    python benchmark_embedding.py                     # synthetic chunks
+    python benchmark_embedding.py --pdf paper.pdf     # chunks from a real PDF
+
+The "sequential" path is the previous behaviour (one `embed_query` HTTP call per
+chunk); "batched" uses `OllamaEmbedderr.embed_documents` with the given batch
+size and worker count.
+"""
+import argparse
+import time
+
+from embedder import OllamaEmbedderr
+
+
+def load_chunks(pdf_path: str = None, count: int = 500):
+    if pdf_path:
+        from langchain_community.document_loaders import PyPDFLoader
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        documents = PyPDFLoader(pdf_path).load()
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        return [doc.page_content for doc in splitter.split_documents(documents)][:count]
+    return [f"Chunk {i}: retrieval augmented generation combines search with language models. " * 12
+            for i in range(count)]
+
+
+def run(label: str, fn, chunks):
+    start = time.perf_counter()
+    vectors = fn(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {len(vectors):>6} chunks  {elapsed:8.2f}s  {len(vectors) / elapsed:8.1f} chunks/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to chunk instead of synthetic text")
+    parser.add_argument("--count", type=int, default=500, help="Maximum number of chunks")
+    parser.add_argument("--model", default="snowflake-arctic-embed")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf, args.count)
+    embedder = OllamaEmbedderr(model_name=args.model, batch_size=args.batch_size, max_workers=args.workers)
+    embedder.embed_query("warm up")  # keep model-load time out of both measurements
+
+    sequential = run("sequential (embed_query loop)", lambda texts: [embedder.embed_query(t) for t in texts], chunks)
+    batched = run(f"batched (bs={args.batch_size}, workers={args.workers})", embedder.embed_documents, chunks)
+    print(f"speed-up: {sequential / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare Qdrant collection profiles (float32 / scalar int8 / binary) on a local Qdrant instance.
+
+    docker run -p 6333:6333 qdrant/qdrant
+    python benchmark_quantization.py                           # 20k clustered 1024-d vectors
+    python benchmark_quantization.py --dim 1536                # OpenAI-sized (math agent)
+    python benchmark_quantization.py --from-collection test-qwen-r1
+
+Every profile gets its own temporary collection with the same points. Queries are
+held-out vectors from the same distribution; recall@k is measured against exact
+(brute-force cosine) neighbours. Vector memory is estimated from the profile layout
+(Qdrant does not report per-collection RAM); HNSW links are the same for all profiles.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import CollectionStatus, PointStruct
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_common.qdrant_profile import PROFILES, collection_config, estimate_vector_ram, search_params
+
+UPSERT_BATCH = 512
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def synthetic_vectors(count, dim, seed=0):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 200), dim))
+    labels = rng.integers(0, len(centers), count)
+    return normalize(centers[labels] + 0.6 * rng.standard_normal((count, dim))).astype(np.float32)
+
+
+def collection_vectors(client, collection_name, count):
+    vectors, offset = [], None
+    while len(vectors) < count:
+        points, offset = client.scroll(collection_name=collection_name, limit=256, offset=offset,
+                                       with_payload=False, with_vectors=True)
+        vectors.extend(p.vector for p in points)
+        if offset is None:
+            break
+    return normalize(np.asarray(vectors[:count], dtype=np.float32))
+
+
+def wait_for_index(client, collection_name, timeout=600):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if client.get_collection(collection_name).status == CollectionStatus.GREEN:
+            return time.perf_counter() - start
+        time.sleep(0.5)
+    raise TimeoutError(f"{collection_name} was not indexed within {timeout}s")
+
+
+def build(client, collection_name, vectors, profile):
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **collection_config(vectors.shape[1], profile))
+    start = time.perf_counter()
+    for i in range(0, len(vectors), UPSERT_BATCH):
+        batch = vectors[i:i + UPSERT_BATCH]
+        client.upsert(collection_name=collection_name, wait=True,
+                      points=[PointStruct(id=i + j, vector=v.tolist()) for j, v in enumerate(batch)])
+    return time.perf_counter() - start + wait_for_index(client, collection_name)
+
+
+def evaluate(client, collection_name, profile, queries, truth, k):
+    params = search_params(profile)
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = client.query_points(collection_name=collection_name, query=query.tolist(), limit=k,
+                                   search_params=params, with_payload=False).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({h.id for h in hits} & set(expected)) / k)
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "recall": sum(recalls) / len(recalls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--dim", type=int, default=1024, help="Vector size for synthetic data")
+    parser.add_argument("--count", type=int, default=20000, help="Number of indexed points")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="*", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--from-collection", help="Use vectors from an existing collection instead")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collections")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url)
+    if args.from_collection:
+        vectors = collection_vectors(client, args.from_collection, args.count + args.queries)
+    else:
+        vectors = synthetic_vectors(args.count + args.queries, args.dim)
+    points, queries = vectors[:-args.queries], vectors[-args.queries:]
+    # Exact neighbours: dot product of unit vectors == cosine similarity
+    truth = np.argsort(-(queries @ points.T), axis=1)[:, :args.k].tolist()
+    print(f"{len(points)} points, {len(queries)} queries, dim {points.shape[1]}, k={args.k}")
+
+    for profile in args.profiles:
+        collection_name = f"bench_{profile}_{points.shape[1]}"
+        build_sec = build(client, collection_name, points, profile)
+        stats = evaluate(client, collection_name, profile, queries, truth, args.k)
+        memory = estimate_vector_ram(len(points), points.shape[1], profile)
+        print(f"{profile:<8} recall@{args.k} {stats['recall']:6.1%}   p50 {stats['p50']:6.1f} ms  "
+              f"p95 {stats['p95']:6.1f} ms   vectors RAM {memory['ram_bytes'] / 2**20:7.1f} MiB  "
+              f"disk {memory['disk_bytes'] / 2**20:7.1f} MiB   build {build_sec:5.1f} s")
+        if not args.keep:
+            client.delete_collection(collection_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare recall@k and latency of dense, BM25 and hybrid (RRF) retrieval on a local corpus.
+
+    python benchmark_retrieval.py                     # synthetic corpus with error codes
+    python benchmark_retrieval.py --pdf manual.pdf    # chunks from real PDFs
+
+Each query is generated from one chunk, which is its only relevant answer:
+"keyword" queries use the chunk's rarest term (identifiers, error codes), "phrase"
+queries a short span of its text. Dense search embeds with the same Ollama model as
+the app and ranks in memory, so no Qdrant instance is needed.
+"""
+import argparse
+import math
+import random
+import time
+from types import SimpleNamespace
+
+from embedder import OllamaEmbedderr
+from hybrid_search import MIN_COVERAGE, BM25Index, doc_key, hybrid_retrieve, tokenize
+
+TOPICS = ["connection pool", "embedding cache", "vector index", "token budget", "rate limiter",
+          "retry policy", "document loader", "chat history", "web search", "model warm-up"]
+
+
+class InMemoryDenseStore:
+    """Exact cosine search over pre-computed embeddings (stands in for Qdrant)."""
+
+    def __init__(self, embedder, documents):
+        self.embedder = embedder
+        self.documents = documents
+        self.vectors = [self._normalize(v) for v in embedder.embed_documents([d.page_content for d in documents])]
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def similarity_search_with_relevance_scores(self, query, k=5):
+        q = self._normalize(self.embedder.embed_query(query))
+        scored = [(doc, sum(a * b for a, b in zip(q, v))) for doc, v in zip(self.documents, self.vectors)]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:k]
+
+
+def load_documents(pdf_paths, count):
+    if pdf_paths:
+        from langchain_community.document_loaders import PyPDFLoader
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        docs = []
+        for path in pdf_paths:
+            for doc in splitter.split_documents(PyPDFLoader(path).load()):
+                docs.append(SimpleNamespace(page_content=doc.page_content, metadata={"file_name": path}))
+        return docs[:count]
+
+    rng = random.Random(0)
+    docs = []
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        code = f"E{rng.randint(1000, 9999)}_{rng.choice(['TIMEOUT', 'REFUSED', 'OVERFLOW', 'MISMATCH'])}"
+        text = (f"Section {i}: the {topic} reports {code} when the upstream service misbehaves. "
+                f"Operators should inspect the {topic} settings, restart the worker and check the logs. "
+                f"This failure mode of the {topic} is usually transient.")
+        docs.append(SimpleNamespace(page_content=text, metadata={"file_name": "synthetic"}))
+    return docs
+
+
+def make_queries(docs, bm25, n_queries, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for doc in rng.sample(docs, min(n_queries, len(docs))):
+        terms = set(tokenize(doc.page_content))
+        if not terms:
+            continue
+        # Rarest term in the corpus = the most identifier-like one
+        rare = min(terms, key=lambda t: len(bm25._postings.get(t, ())))
+        queries.append(("keyword", f"What does {rare} mean?", doc_key(doc)))
+        words = doc.page_content.split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(("phrase", " ".join(words[start:start + 8]), doc_key(doc)))
+    return queries
+
+
+def evaluate(label, search, queries, k):
+    latencies, hits = [], {}
+    for kind, query, gold in queries:
+        start = time.perf_counter()
+        docs = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = gold in {doc_key(d) for d in docs[:k]}
+        hits.setdefault(kind, []).append(found)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    recalls = "  ".join(f"{kind} {sum(v) / len(v):6.1%}" for kind, v in sorted(hits.items()))
+    print(f"{label:<8} recall@{k}: {recalls}   p50 {p50:7.1f} ms  p95 {p95:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", help="PDFs to chunk instead of the synthetic corpus")
+    parser.add_argument("--count", type=int, default=500, help="Maximum number of chunks")
+    parser.add_argument("--queries", type=int, default=100, help="Number of source chunks to query")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = load_documents(args.pdf, args.count)
+    bm25 = BM25Index()
+    bm25.add_documents(docs)
+    queries = make_queries(docs, bm25, args.queries)
+    print(f"{len(docs)} chunks, {len(queries)} queries")
+
+    dense_store = InMemoryDenseStore(OllamaEmbedderr(), docs)
+    evaluate("dense", lambda q: [d for d, _ in dense_store.similarity_search_with_relevance_scores(q, k=args.k)],
+             queries, args.k)
+    # Same coverage filter as the app's hybrid path
+    evaluate("bm25", lambda q: [d for d, _ in bm25.search(q, k=args.k, min_coverage=MIN_COVERAGE)],
+             queries, args.k)
+    evaluate("hybrid", lambda q: hybrid_retrieve(dense_store, bm25, q, k=args.k, score_threshold=0.0),
+             queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import ollama
+from agno.embedder.ollama import OllamaEmbedder
+from langchain_core.embeddings import Embeddings
+
+
+class OllamaEmbedderr(Embeddings):
+    def __init__(self, model_name="snowflake-arctic-embed", batch_size: int = 32, max_workers: int = 4,
+                 host: str = None):
+        """
+        Initialize the OllamaEmbedderr with a specific model.
+
+        Args:
+            model_name (str): The name of the model to use for embedding.
+            batch_size (int): Number of texts sent to Ollama per `/api/embed` request.
+            max_workers (int): Maximum number of batches embedded in parallel.
+            host (str): Ollama server URL; defaults to OLLAMA_HOST or localhost.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.embedder = OllamaEmbedder(id=model_name, dimensions=1024)
+        self.client = ollama.Client(host=host) if host else ollama.Client()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        # One HTTP round trip for the whole batch (Ollama's list `input`)
+        return list(self.client.embed(model=self.model_name, input=texts)["embeddings"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        # map() keeps batch order, so vectors line up with the input texts
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._embed_batch, batches)
+            return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedder.get_embedding(text)
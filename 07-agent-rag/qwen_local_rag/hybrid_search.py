@@ -0,0 +1,143 @@
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_common.chunk_ids import chunk_id, document_source
+
+# Keeps identifiers such as "ERR_CONN_REFUSED", "0x80070005" or "v2.3.1" as one token
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-:]\w+)*")
+# ...and additionally indexes their parts ("err", "conn", "refused")
+PART_SEPARATORS = re.compile(r"[._\-:]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or "
+    "that the this to was what when where which who why will with you your".split()
+)
+RRF_K = 60
+# Share of the query's (indexed) IDF weight a BM25 hit must match; used by the app and the benchmark
+MIN_COVERAGE = 0.6
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # Also index the parts of compound tokens ("v2.3.1" -> "v2", "3", "1")
+        parts = PART_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in STOPWORDS)
+    return tokens
+
+
+def doc_key(doc) -> str:
+    return chunk_id(doc.page_content, document_source(doc))
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+
+    Documents are added incrementally as they are ingested; re-adding a chunk with
+    the same content-addressed id is a no-op, matching the Qdrant upserts.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._docs = []
+        self._keys = {}
+        self._lengths = []
+        self._total_length = 0
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add_documents(self, documents: Sequence) -> int:
+        added = 0
+        with self._lock:
+            for doc in documents:
+                key = doc_key(doc)
+                if key in self._keys:
+                    continue
+                index = len(self._docs)
+                self._keys[key] = index
+                self._docs.append(doc)
+                terms = Counter(tokenize(doc.page_content))
+                for term, tf in terms.items():
+                    self._postings[term][index] = tf
+                length = sum(terms.values())
+                self._lengths.append(length)
+                self._total_length += length
+                added += 1
+        return added
+
+    def search(self, query: str, k: int = 5, min_coverage: float = 0.0) -> List[Tuple[object, float]]:
+        """
+        Top-k documents by BM25 score.
+
+        `min_coverage` drops documents that match less than that share of the query's
+        total IDF weight, so a single common word doesn't count as a keyword hit. Only
+        terms present in the index count: words no chunk contains ("mean", typos) would
+        otherwise carry the maximum IDF and hide exact identifier matches.
+        """
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs or 1.0
+            scores = defaultdict(float)
+            matched_idf = defaultdict(float)
+            total_idf = 0.0
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                total_idf += idf
+                for index, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / avg_length)
+                    scores[index] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched_idf[index] += idf
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            return [(self._docs[index], score) for index, score in ranked
+                    if matched_idf[index] >= min_coverage * total_idf][:k]
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence], k: int = 5, rrf_k: int = RRF_K) -> List:
+    """Fuse ranked document lists: score(d) = sum(1 / (rrf_k + rank)) over the lists containing d."""
+    scores = defaultdict(float)
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+    fused = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in fused]
+
+
+def hybrid_retrieve(vector_store, bm25_index: BM25Index, query: str, k: int = 5,
+                    score_threshold: float = 0.7, min_coverage: float = MIN_COVERAGE,
+                    fetch_k: int = 20, **search_kwargs) -> List:
+    """
+    Dense hits above `score_threshold` fused with BM25 hits covering `min_coverage` of the query (RRF).
+
+    Either side alone can make a document relevant, so exact keyword matches (error
+    codes, identifiers) no longer fall through to the web search fallback.
+    Extra keyword arguments (e.g. Qdrant `search_params`) go to the dense search.
+    """
+    dense = []
+    if vector_store is not None:
+        hits = vector_store.similarity_search_with_relevance_scores(query, k=fetch_k, **search_kwargs)
+        dense = [doc for doc, score in hits if score >= score_threshold]
+    sparse = [doc for doc, _ in bm25_index.search(query, k=fetch_k, min_coverage=min_coverage)]
+    return reciprocal_rank_fusion([dense, sparse], k=k)
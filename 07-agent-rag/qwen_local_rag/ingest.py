@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+def parse_pdf_bytes(file_name: str, data: bytes) -> Tuple[str, List, str]:
+    """
+    Parse and split one PDF. Runs inside a worker process, so it only takes and
+    returns picklable values.
+
+    Returns:
+        (file_name, chunks, error): `error` is None on success.
+    """
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+            tmp_file.write(data)
+            tmp_path = tmp_file.name
+        documents = PyPDFLoader(tmp_path).load()
+
+        # Add source metadata
+        for doc in documents:
+            doc.metadata.update({
+                "source_type": "pdf",
+                "file_name": file_name,
+                "timestamp": datetime.now().isoformat()
+            })
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            add_start_index=True  # lets the context packer keep chunks in reading order
+        )
+        return file_name, text_splitter.split_documents(documents), None
+    except Exception as e:
+        return file_name, [], str(e)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def ingest_pdfs(files: List[Tuple[str, bytes]], store_chunks: Callable[[List], None],
+                max_workers: int = None, max_pending: int = 4,
+                on_progress: Callable[[str, str, int, str], None] = None) -> List[str]:
+    """
+    Parse PDFs on a process pool while the calling thread embeds/uploads finished ones.
+
+    At most `max_workers + max_pending` files are parsed or waiting for upload at any
+    time (a bounded queue), so memory stays flat when many PDFs are dropped at once.
+    `store_chunks` and `on_progress(file_name, stage, n_chunks, error)` are always called
+    on the calling thread, which keeps them safe to use with Streamlit.
+
+    Returns:
+        Names of the files that were parsed and stored successfully.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    on_progress = on_progress or (lambda *args: None)
+    pending = deque(files)
+    in_flight = set()
+    stored = []
+
+    # "spawn" avoids forking the multi-threaded Streamlit server
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        def submit_more():
+            while pending and len(in_flight) < max_workers + max_pending:
+                file_name, data = pending.popleft()
+                in_flight.add(pool.submit(parse_pdf_bytes, file_name, data))
+                on_progress(file_name, "parsing", 0, None)
+
+        submit_more()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                file_name, chunks, error = future.result()
+                # Refill the pool before uploading so parsing overlaps with embedding
+                submit_more()
+                if error or not chunks:
+                    on_progress(file_name, "failed", 0, error or "no text extracted")
+                    continue
+                on_progress(file_name, "embedding", len(chunks), None)
+                try:
+                    store_chunks(chunks)
+                except Exception as e:
+                    on_progress(file_name, "failed", len(chunks), str(e))
+                    continue
+                stored.append(file_name)
+                on_progress(file_name, "stored", len(chunks), None)
+    return stored
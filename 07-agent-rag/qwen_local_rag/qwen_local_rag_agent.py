@@ -1,40 +1,43 @@
 import os
-import tempfile
+import sys
+import threading
+import time
 from datetime import datetime
 from typing import List
 import streamlit as st
 import bs4
+import ollama
 from agno.agent import Agent
 from agno.models.ollama import Ollama
-from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
+from langchain_community.document_loaders import WebBaseLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from langchain_core.embeddings import Embeddings
 from agno.tools.exa import ExaTools
-from agno.embedder.ollama import OllamaEmbedder
+from embedder import OllamaEmbedderr
+from ingest import ingest_pdfs
+from think_stream import split_think_stream
+from hybrid_search import BM25Index, hybrid_retrieve
 
-
-class OllamaEmbedderr(Embeddings):
-    def __init__(self, model_name="snowflake-arctic-embed"):
-        """
-        Initialize the OllamaEmbedderr with a specific model.
-
-        Args:
-            model_name (str): The name of the model to use for embedding.
-        """
-        self.embedder = OllamaEmbedder(id=model_name, dimensions=1024)
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self.embed_query(text) for text in texts]
-
-    def embed_query(self, text: str) -> List[float]:
-        return self.embedder.get_embedding(text)
+# Shared helpers live in 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_common.chunk_ids import format_upsert_stats, upsert_new_documents
+from rag_common.context_packer import chunks_from_documents, format_pack_stats, pack_context, truncate_to_tokens
+from rag_common.embedding_cache import CachedEmbeddings, get_default_cache
+from rag_common.qdrant_profile import ensure_collection, get_profile, search_params
+from rag_common.rerank import format_rerank_stats, rerank_documents
 
 
 # Constants
 COLLECTION_NAME = "test-qwen-r1"
+RETRIEVAL_K = 5
+RERANK_FETCH_K = 15
+QDRANT_URL = "http://localhost:6333"
+WEB_SEARCH_MODEL = "llama3.2"
+
+# Wall time of this script run (shown in the sidebar) to compare rerun latency
+_rerun_start = time.perf_counter()
 
 
 # Streamlit App Initialization
@@ -62,8 +65,18 @@ if 'force_web_search' not in st.session_state:
     st.session_state.force_web_search = False
 if 'similarity_threshold' not in st.session_state:
     st.session_state.similarity_threshold = 0.7
+if 'retrieval_mode' not in st.session_state:
+    st.session_state.retrieval_mode = "Hybrid"
+if 'rerank_enabled' not in st.session_state:
+    st.session_state.rerank_enabled = False
+if 'context_token_budget' not in st.session_state:
+    st.session_state.context_token_budget = 1500
 if 'rag_enabled' not in st.session_state:
     st.session_state.rag_enabled = True  # RAG is enabled by default
+if 'stream_responses' not in st.session_state:
+    st.session_state.stream_responses = True
+if 'warm_up_model' not in st.session_state:
+    st.session_state.warm_up_model = True
 
 
 # Sidebar Configuration
@@ -87,6 +100,16 @@ st.session_state.model_version = st.sidebar.radio(
 )
 
 st.sidebar.info("Run ollama pull qwen3:1.7b")
+st.session_state.stream_responses = st.sidebar.toggle(
+    "Stream responses",
+    value=st.session_state.stream_responses,
+    help="Show reasoning and answer tokens as they are generated"
+)
+st.session_state.warm_up_model = st.sidebar.toggle(
+    "Warm up model",
+    value=st.session_state.warm_up_model,
+    help="Load the selected model into Ollama in the background so the first question doesn't wait for it"
+)
 
 # RAG Mode Toggle
 st.sidebar.header("📚 RAG Mode")
@@ -107,6 +130,25 @@ if st.session_state.rag_enabled:
         value=0.7,
         help="Lower values will return more documents but might be less relevant. Higher values are more strict."
     )
+    st.session_state.retrieval_mode = st.sidebar.radio(
+        "Retrieval Mode",
+        options=["Hybrid", "Dense"],
+        index=["Hybrid", "Dense"].index(st.session_state.retrieval_mode),
+        help="Hybrid fuses BM25 keyword matches (error codes, identifiers) with dense similarity search."
+    )
+    st.session_state.rerank_enabled = st.sidebar.toggle(
+        "Rerank with cross-encoder",
+        value=st.session_state.rerank_enabled,
+        help="Over-fetch candidates and keep the best ones according to a small CPU cross-encoder (pip install fastembed)."
+    )
+    st.session_state.context_token_budget = st.sidebar.slider(
+        "Context token budget",
+        min_value=250,
+        max_value=4000,
+        value=st.session_state.context_token_budget,
+        step=250,
+        help="Maximum prompt tokens spent on retrieved chunks or web results. Smaller prompts mean faster prefill."
+    )
 
 # Add in the sidebar configuration section, after the existing API inputs
 
@@ -131,48 +173,118 @@ if st.session_state.use_web_search:
     )
     search_domains = [d.strip() for d in custom_domains.split(",") if d.strip()]
 
+# Cached Resources (shared across reruns and sessions)
+@st.cache_resource
+def get_qdrant_client(url: str = QDRANT_URL) -> QdrantClient:
+    """One Qdrant client (and HTTP connection pool) per process."""
+    return QdrantClient(url=url)
+
+
+@st.cache_resource
+def get_embedder() -> CachedEmbeddings:
+    """One Ollama embedder wrapped with the persistent embedding cache."""
+    return CachedEmbeddings(OllamaEmbedderr(), model_name="ollama/snowflake-arctic-embed")
+
+
+@st.cache_resource
+def get_vector_store(url: str = QDRANT_URL, collection_name: str = COLLECTION_NAME) -> QdrantVectorStore:
+    """Create the collection once if needed (with the QDRANT_PROFILE layout) and return the shared vector store."""
+    client = get_qdrant_client(url)
+    if ensure_collection(client, collection_name, size=1024):
+        print(f"📚 Created new collection: {collection_name} ({get_profile()['name']} profile)")
+    return QdrantVectorStore(
+        client=client,
+        collection_name=collection_name,
+        embedding=get_embedder()
+    )
+
+
+@st.cache_resource
+def get_ollama_client() -> ollama.Client:
+    """One Ollama HTTP client (keep-alive connection pool) shared by every agent in the process.
+
+    Agents themselves are stateful (run id, run response, memory), so a fresh, cheap
+    Agent is built per run on top of this client instead of sharing agents across sessions.
+    """
+    return ollama.Client()
+
+
+@st.cache_resource
+def get_warm_up_state() -> dict:
+    """Models warmed up (or warming up) in this process."""
+    return {"lock": threading.Lock(), "models": set()}
+
+
+def warm_up_model(model_version: str) -> threading.Thread | None:
+    """Ask Ollama to load `model_version` once per process, without blocking the page.
+
+    A failed warm-up is forgotten, so the next rerun tries again.
+    """
+    state = get_warm_up_state()
+    with state["lock"]:
+        if model_version in state["models"]:
+            return None
+        state["models"].add(model_version)
+    client = get_ollama_client()
+
+    def ping():
+        try:
+            # An empty prompt only loads the model into memory
+            client.generate(model=model_version, prompt="")
+            print(f"🔥 Warmed up {model_version}")
+        except Exception as e:
+            print(f"⚠️ Warm-up of {model_version} failed: {e}")
+            with state["lock"]:
+                state["models"].discard(model_version)
+
+    thread = threading.Thread(target=ping, daemon=True)
+    thread.start()
+    return thread
+
+
+if st.session_state.warm_up_model:
+    warm_up_model(st.session_state.model_version)
+    if st.session_state.use_web_search:
+        warm_up_model(WEB_SEARCH_MODEL)
+
+
+@st.cache_resource
+def get_bm25_index(url: str = QDRANT_URL, collection_name: str = COLLECTION_NAME) -> BM25Index:
+    """Keyword index over the same chunks as the vector store, rebuilt from Qdrant on startup."""
+    index = BM25Index()
+    client = get_qdrant_client(url)
+    if client.collection_exists(collection_name=collection_name):
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name, limit=256, offset=offset, with_payload=True, with_vectors=False
+            )
+            index.add_documents([
+                Document(page_content=p.payload.get("page_content", ""), metadata=p.payload.get("metadata") or {})
+                for p in points
+            ])
+            if offset is None:
+                break
+        print(f"🔎 BM25 index loaded with {len(index)} chunks")
+    return index
+
+
 # Utility Functions
 def init_qdrant() -> QdrantClient | None:
-    """Initialize Qdrant client with local Docker setup.
+    """Return the cached Qdrant client for the local Docker setup.
 
     Returns:
         QdrantClient: The initialized Qdrant client if successful.
         None: If the initialization fails.
     """
     try:
-        return QdrantClient(url="http://localhost:6333")
+        return get_qdrant_client()
     except Exception as e:
         st.error(f"🔴 Qdrant connection failed: {str(e)}")
         return None
 
 
-# Document Processing Functions
-def process_pdf(file) -> List:
-    """Process PDF file and add source metadata."""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(file.getvalue())
-            loader = PyPDFLoader(tmp_file.name)
-            documents = loader.load()
-            
-            # Add source metadata
-            for doc in documents:
-                doc.metadata.update({
-                    "source_type": "pdf",
-                    "file_name": file.name,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            return text_splitter.split_documents(documents)
-    except Exception as e:
-        st.error(f"📄 PDF processing error: {str(e)}")
-        return []
-
-
+# Document Processing Functions (PDFs are parsed and split in ingest.py)
 def process_web(url: str) -> List:
     """Process web URL and add source metadata."""
     try:
@@ -196,7 +308,8 @@ def process_web(url: str) -> List:
             
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
-            chunk_overlap=200
+            chunk_overlap=200,
+            add_start_index=True  # lets the context packer keep chunks in reading order
         )
         return text_splitter.split_documents(documents)
     except Exception as e:
@@ -206,33 +319,17 @@ def process_web(url: str) -> List:
 
 # Vector Store Management
 def create_vector_store(client, texts):
-    """Create and initialize vector store with documents."""
+    """Append documents to the shared vector store (created once per process)."""
     try:
-        # Create collection if needed
-        try:
-            client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=1024,  
-                    distance=Distance.COSINE
-                )
-            )
-            st.success(f"📚 Created new collection: {COLLECTION_NAME}")
-        except Exception as e:
-            if "already exists" not in str(e).lower():
-                raise e
-        
-        # Initialize vector store
-        vector_store = QdrantVectorStore(
-            client=client,
-            collection_name=COLLECTION_NAME,
-            embedding=OllamaEmbedderr()
-        )
+        vector_store = get_vector_store()
         
-        # Add documents
+        # Add documents (content-addressed ids: unchanged chunks are not re-embedded)
         with st.spinner('📤 Uploading documents to Qdrant...'):
-            vector_store.add_documents(texts)
+            stats = upsert_new_documents(vector_store, texts)
+            get_bm25_index().add_documents(texts)
             st.success("✅ Documents stored successfully!")
+            st.caption(format_upsert_stats(stats))
+            st.caption(f"♻️ Embedding cache hit rate: {get_default_cache().hit_rate:.0%}")
             return vector_store
             
     except Exception as e:
@@ -240,13 +337,18 @@ def create_vector_store(client, texts):
         return None
 
 def get_web_search_agent() -> Agent:
-    """Initialize a web search agent."""
+    """Build a per-run web search agent for the current domains and Exa key."""
+    return _build_web_search_agent(st.session_state.exa_api_key, list(search_domains))
+
+
+def _build_web_search_agent(exa_api_key: str, domains: List[str]) -> Agent:
+    """Initialize a web search agent on the shared Ollama client."""
     return Agent(
         name="Web Search Agent",
-        model=Ollama(id="llama3.2"),
+        model=Ollama(id=WEB_SEARCH_MODEL, client=get_ollama_client()),
         tools=[ExaTools(
-            api_key=st.session_state.exa_api_key,
-            include_domains=search_domains,
+            api_key=exa_api_key,
+            include_domains=domains,
             num_results=5
         )],
         instructions="""You are a web search expert. Your task is to:
@@ -260,10 +362,15 @@ def get_web_search_agent() -> Agent:
 
 
 def get_rag_agent() -> Agent:
-    """Initialize the main RAG agent."""
+    """Build a per-run RAG agent for the selected model."""
+    return _build_rag_agent(st.session_state.model_version)
+
+
+def _build_rag_agent(model_version: str) -> Agent:
+    """Initialize the main RAG agent on the shared Ollama client."""
     return Agent(
         name="Qwen 3 RAG Agent",
-        model=Ollama(id=st.session_state.model_version),
+        model=Ollama(id=model_version, client=get_ollama_client()),
         instructions="""You are an Intelligent Agent specializing in providing accurate answers.
 
         When asked a question:
@@ -286,16 +393,59 @@ def get_rag_agent() -> Agent:
 
 
 
+def generate_response(agent: Agent, prompt: str) -> str:
+    """
+    Run the agent inside the current chat message and return the final answer.
+
+    Reasoning inside <think>...</think> goes to a "thinking" expander and the answer
+    below it; in streaming mode both are filled in as tokens arrive.
+    """
+    thinking_area = st.container()
+    answer_area = st.empty()
+
+    if st.session_state.stream_responses:
+        chunks = (chunk.content for chunk in agent.run(prompt, stream=True))
+    else:
+        chunks = [agent.run(prompt).content]
+
+    thinking, answer = "", ""
+    thinking_box = None
+    for kind, text in split_think_stream(chunks):
+        if kind == "think":
+            if thinking_box is None:
+                with thinking_area:
+                    with st.expander("🤔 See thinking process", expanded=st.session_state.stream_responses):
+                        thinking_box = st.empty()
+            thinking += text
+            thinking_box.markdown(thinking)
+        else:
+            answer += text
+            answer_area.markdown(answer)
+
+    answer = answer.strip()
+    answer_area.markdown(answer)
+    return answer
+
+
+def retrieve_documents(query: str, vector_store, threshold: float = 0.7, k: int = RETRIEVAL_K) -> List:
+    """Retrieve relevant chunks with the retrieval mode selected in the sidebar."""
+    if st.session_state.retrieval_mode == "Hybrid":
+        return hybrid_retrieve(vector_store, get_bm25_index(), query, k=k, score_threshold=threshold,
+                               search_params=search_params())
+
+    retriever = vector_store.as_retriever(
+        search_type="similarity_score_threshold",
+        search_kwargs={"k": k, "score_threshold": threshold, "search_params": search_params()}
+    )
+    return retriever.invoke(query)
+
+
 def check_document_relevance(query: str, vector_store, threshold: float = 0.7) -> tuple[bool, List]:
 
     if not vector_store:
         return False, []
         
-    retriever = vector_store.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={"k": 5, "score_threshold": threshold}
-    )
-    docs = retriever.invoke(query)
+    docs = retrieve_documents(query, vector_store, threshold)
     return bool(docs), docs
 
 
@@ -324,21 +474,47 @@ if st.session_state.rag_enabled:
             url_input = st.text_input("Enter URL to scrape")
 
             if uploaded_files:
-                st.write(f"Processing {len(uploaded_files)} PDF file(s)...")
-                all_texts = []
+                new_files = [f for f in uploaded_files if f.name not in st.session_state.processed_documents]
                 for file in uploaded_files:
-                    if file.name not in st.session_state.processed_documents:
-                        with st.spinner(f"Processing {file.name}... "): 
-                            texts = process_pdf(file)
-                            if texts: 
-                                all_texts.extend(texts)
-                                st.session_state.processed_documents.append(file.name)
-                    else:
+                    if file.name in st.session_state.processed_documents:
                         st.write(f"📄 {file.name} already processed.")
-                
-                if all_texts:
-                    with st.spinner("Creating vector store..."):
-                        st.session_state.vector_store = create_vector_store(qdrant_client, all_texts)
+
+                if new_files:
+                    st.write(f"Processing {len(new_files)} PDF file(s) in parallel...")
+                    progress_bar = st.progress(0.0)
+                    status_lines = {f.name: st.empty() for f in new_files}
+                    finished = []
+                    stage_icons = {"parsing": "⏳", "embedding": "🧮", "stored": "✅", "failed": "❌"}
+
+                    def on_progress(file_name, stage, n_chunks, error):
+                        detail = f" ({n_chunks} chunks)" if n_chunks else ""
+                        detail += f": {error}" if error else ""
+                        status_lines[file_name].write(f"{stage_icons[stage]} {file_name} — {stage}{detail}")
+                        if stage in ("stored", "failed"):
+                            finished.append(file_name)
+                            progress_bar.progress(len(finished) / len(new_files))
+
+                    upsert_stats = []
+
+                    def store_chunks(chunks):
+                        # Embedding/upload runs here while the process pool keeps parsing
+                        st.session_state.vector_store = get_vector_store()
+                        upsert_stats.append(upsert_new_documents(st.session_state.vector_store, chunks))
+                        get_bm25_index().add_documents(chunks)
+
+                    stored = ingest_pdfs(
+                        [(f.name, f.getvalue()) for f in new_files],
+                        store_chunks,
+                        on_progress=on_progress,
+                    )
+                    st.session_state.processed_documents.extend(stored)
+                    if upsert_stats:
+                        st.caption(format_upsert_stats({
+                            "added": sum(s["added"] for s in upsert_stats),
+                            "skipped": sum(s["skipped"] for s in upsert_stats),
+                            "seconds": sum(s["seconds"] for s in upsert_stats),
+                            "collection_size": upsert_stats[-1]["collection_size"],
+                        }))
 
             if url_input:
                 if url_input not in st.session_state.processed_documents:
@@ -388,17 +564,30 @@ if prompt:
             docs = []
             if not st.session_state.force_web_search and st.session_state.vector_store:
                 # Try document search first
-                retriever = st.session_state.vector_store.as_retriever(
-                    search_type="similarity_score_threshold",
-                    search_kwargs={
-                        "k": 5, 
-                        "score_threshold": st.session_state.similarity_threshold
-                    }
+                search_start = time.perf_counter()
+                docs = retrieve_documents(
+                    rewritten_query,
+                    st.session_state.vector_store,
+                    st.session_state.similarity_threshold,
+                    k=RERANK_FETCH_K if st.session_state.rerank_enabled else RETRIEVAL_K
                 )
-                docs = retriever.invoke(rewritten_query)
+                search_ms = (time.perf_counter() - search_start) * 1000
+                if docs and st.session_state.rerank_enabled:
+                    # Over-fetched candidates -> best RETRIEVAL_K within the token budget
+                    docs, rerank_stats = rerank_documents(
+                        rewritten_query,
+                        docs,
+                        top_n=RETRIEVAL_K,
+                        token_budget=st.session_state.context_token_budget,
+                        baseline_k=RETRIEVAL_K
+                    )
+                    st.caption(format_rerank_stats(rerank_stats))
                 if docs:
-                    context = "\n\n".join([d.page_content for d in docs])
-                    st.info(f"📊 Found {len(docs)} relevant documents (similarity > {st.session_state.similarity_threshold})")
+                    # Dedup overlapping chunks, trim to the budget, stable order for prefix caching
+                    packed = pack_context(chunks_from_documents(docs), st.session_state.context_token_budget)
+                    context = packed["text"]
+                    st.caption(format_pack_stats(packed))
+                    st.info(f"📊 Found {len(docs)} relevant documents ({st.session_state.retrieval_mode.lower()} search, similarity > {st.session_state.similarity_threshold}, {search_ms:.0f} ms)")
                 elif st.session_state.use_web_search:
                     st.info("🔄 No relevant documents found in database, falling back to web search...")
 
@@ -411,7 +600,7 @@ if prompt:
                         web_search_agent = get_web_search_agent()
                         web_results = web_search_agent.run(rewritten_query).content
                         if web_results:
-                            context = f"Web Search Results:\n{web_results}"
+                            context = f"Web Search Results:\n{truncate_to_tokens(web_results, st.session_state.context_token_budget)}"
                             if st.session_state.force_web_search:
                                 st.info("ℹ️ Using web search as requested via toggle.")
                             else:
@@ -433,17 +622,15 @@ Please provide a comprehensive answer based on the available information."""
                         full_prompt = f"Original Question: {prompt}\n"
                         st.info("ℹ️ No relevant information found in documents or web search.")
 
-                    response = rag_agent.run(full_prompt)
-                    
-                    # Add assistant response to history
-                    st.session_state.history.append({
-                        "role": "assistant",
-                        "content": response.content
-                    })
-                    
-                    # Display assistant response
+                    # Display assistant response (streamed when enabled)
                     with st.chat_message("assistant"):
-                        st.write(response.content)
+                        final_response = generate_response(rag_agent, full_prompt)
+                        
+                        # Add assistant response to history (only the final response)
+                        st.session_state.history.append({
+                            "role": "assistant",
+                            "content": final_response
+                        })
                         
                         # Show sources if available
                         if not st.session_state.force_web_search and 'docs' in locals() and docs:
@@ -472,7 +659,7 @@ Please provide a comprehensive answer based on the available information."""
                         try:
                             web_results = web_search_agent.run(prompt).content
                             if web_results:
-                                context = f"Web Search Results:\n{web_results}"
+                                context = f"Web Search Results:\n{truncate_to_tokens(web_results, st.session_state.context_token_budget)}"
                                 st.info("ℹ️ Using web search as requested.")
                         except Exception as e:
                             st.error(f"❌ Web search error: {str(e)}")
@@ -487,36 +674,20 @@ Please provide a comprehensive answer based on the available information."""
                 else:
                     full_prompt = prompt
 
-                response = rag_agent.run(full_prompt)
-                response_content = response.content
-                
-                # Extract thinking process and final response
-                import re
-                think_pattern = r'<think>(.*?)</think>'
-                think_match = re.search(think_pattern, response_content, re.DOTALL)
-                
-                if think_match:
-                    thinking_process = think_match.group(1).strip()
-                    final_response = re.sub(think_pattern, '', response_content, flags=re.DOTALL).strip()
-                else:
-                    thinking_process = None
-                    final_response = response_content
+                # Display assistant response; thinking and answer are split as tokens arrive
+                with st.chat_message("assistant"):
+                    final_response = generate_response(rag_agent, full_prompt)
                 
                 # Add assistant response to history (only the final response)
                 st.session_state.history.append({
                     "role": "assistant",
                     "content": final_response
                 })
-                
-                # Display assistant response
-                with st.chat_message("assistant"):
-                    if thinking_process:
-                        with st.expander("🤔 See thinking process"):
-                            st.markdown(thinking_process)
-                    st.markdown(final_response)
 
             except Exception as e:
                 st.error(f"❌ Error generating response: {str(e)}")
 
 else:
-    st.warning("You can directly talk to qwen and gemma models locally! Toggle the RAG mode to upload documents!")
\ No newline at end of file
+    st.warning("You can directly talk to qwen and gemma models locally! Toggle the RAG mode to upload documents!")
+
+st.sidebar.caption(f"⏱️ Script run: {(time.perf_counter() - _rerun_start) * 1000:.0f} ms")
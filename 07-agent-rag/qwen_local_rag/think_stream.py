@@ -0,0 +1,62 @@
+from typing import Iterable, Iterator, List, Tuple
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkTagParser:
+    """
+    Incrementally split a token stream into reasoning and answer text.
+
+    Models such as deepseek-r1 and qwen3 wrap their reasoning in <think>...</think>.
+    Tags may be split across chunks (e.g. "<thi" + "nk>"), so a possible partial tag
+    at the end of a chunk is held back until the next chunk decides it.
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Return ("think" | "answer", text) events that are safe to render now."""
+        events = []
+        self._buffer += text
+        while self._buffer:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = self._buffer.find(tag)
+            if index >= 0:
+                self._emit(events, self._buffer[:index])
+                self._buffer = self._buffer[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+            keep = self._partial_tag_length(tag)
+            self._emit(events, self._buffer[:len(self._buffer) - keep])
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return events
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """Emit whatever is still held back once the stream has ended."""
+        events = []
+        self._emit(events, self._buffer)
+        self._buffer = ""
+        return events
+
+    def _emit(self, events, text):
+        if text:
+            events.append(("think" if self.in_think else "answer", text))
+
+    def _partial_tag_length(self, tag: str) -> int:
+        # Longest suffix of the buffer that could be the start of `tag`
+        for length in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+            if tag.startswith(self._buffer[-length:]):
+                return length
+        return 0
+
+
+def split_think_stream(chunks: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Turn an iterable of text chunks into ("think" | "answer", text) events."""
+    parser = ThinkTagParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk or "")
+    yield from parser.flush()
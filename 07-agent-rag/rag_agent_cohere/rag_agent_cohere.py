@@ -52,19 +52,34 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_cohere import CohereEmbeddings, ChatCohere
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from langchain import hub
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import tempfile
 from langgraph.prebuilt import create_react_agent
 from langchain_community.tools import DuckDuckGoSearchRun
 from typing import TypedDict, List
 from langchain_core.language_models import BaseLanguageModel
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from time import sleep
-from tenacity import retry, wait_exponential, stop_after_attempt
-
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.errors import GraphRecursionError
+import hashlib
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# 共享工具模块位于 07-agent-rag/rag_common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_common.chunk_ids import format_upsert_stats, upsert_new_documents
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.qdrant_profile import collection_config, get_profile, search_params
+from rag_common.rate_limit import get_rate_limited_search
+from rag_common.rerank import format_rerank_stats, rerank_documents
+
+# 超过该长度的答案才生成摘要
+SUMMARY_MIN_CHARS = 500
+SUMMARY_CACHE_MAX_ENTRIES = 256
 
 def init_session_state():
     """
@@ -89,6 +104,14 @@ def init_session_state():
         st.session_state.qdrant_api_key = ""
     if 'qdrant_url' not in st.session_state:
         st.session_state.qdrant_url = ""
+    if 'rerank_enabled' not in st.session_state:
+        st.session_state.rerank_enabled = False
+    if 'context_token_budget' not in st.session_state:
+        st.session_state.context_token_budget = 2000
+    if 'summarize_enabled' not in st.session_state:
+        st.session_state.summarize_enabled = True
+    if 'summary_cache_enabled' not in st.session_state:
+        st.session_state.summary_cache_enabled = True
 
 def sidebar_api_form():
     """
@@ -172,18 +195,73 @@ if not sidebar_api_form():
     st.info("Please enter your API credentials in the sidebar to continue.")
     st.stop()
 
+# 可选的交叉编码器重排序：多召回候选，只保留 token 预算内最相关的块
+with st.sidebar:
+    st.header("Retrieval")
+    st.session_state.rerank_enabled = st.toggle(
+        "Rerank with cross-encoder",
+        value=st.session_state.rerank_enabled,
+        help="Over-fetch candidates and keep the best ones according to a small CPU cross-encoder (pip install fastembed)."
+    )
+    if st.session_state.rerank_enabled:
+        st.session_state.context_token_budget = st.slider(
+            "Context token budget", min_value=500, max_value=6000,
+            value=st.session_state.context_token_budget, step=250
+        )
+    st.header("Answer")
+    st.session_state.summarize_enabled = st.toggle(
+        "Summarize long answers",
+        value=st.session_state.summarize_enabled,
+        help=f"Answers over {SUMMARY_MIN_CHARS} characters get a 2-3 sentence summary, generated in the background after the full answer is shown."
+    )
+    st.session_state.summary_cache_enabled = st.toggle(
+        "Cache summaries",
+        value=st.session_state.summary_cache_enabled,
+        disabled=not st.session_state.summarize_enabled,
+        help="Reuse the summary of an identical answer (keyed on its SHA-256) instead of calling the model again."
+    )
+
 # 初始化 Cohere 嵌入模型
 # 使用 embed-english-v3.0 模型进行文本向量化
-embedding = CohereEmbeddings(model="embed-english-v3.0",
-                            cohere_api_key=st.session_state.cohere_api_key)
+# CachedEmbeddings: 持久化嵌入缓存，相同文本不会重复调用 Cohere API
+embedding = CachedEmbeddings(CohereEmbeddings(model="embed-english-v3.0",
+                                              cohere_api_key=st.session_state.cohere_api_key),
+                             model_name="cohere/embed-english-v3.0")
+
+# RAG 提示模板（本地内置的 langchain-ai/retrieval-qa-chat，避免每次提问都通过网络 hub.pull）
+RETRIEVAL_QA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Answer any use questions based solely on the context below:\n\n<context>\n{context}\n</context>"),
+    MessagesPlaceholder(variable_name="chat_history", optional=True),
+    ("human", "{input}"),
+])
+
+
+@st.cache_resource
+def get_chat_model(cohere_api_key: str, timeout_seconds: float = 300) -> ChatCohere:
+    """
+    初始化 Cohere 聊天模型（每个 API 密钥 + 超时设置在进程内只创建一次，跨重跑复用）
+    使用 Command-r7b-12-2024 模型进行对话生成
+    """
+    return ChatCohere(model="command-r7b-12-2024",
+                      temperature=0.1,  # 较低的温度保证答案的一致性
+                      max_tokens=512,   # 限制单次回答的最大长度
+                      verbose=True,     # 启用详细日志
+                      timeout_seconds=timeout_seconds,  # 单次请求超时
+                      cohere_api_key=cohere_api_key)
+
+
+@st.cache_resource
+def get_combine_docs_chain(cohere_api_key: str):
+    """
+    预先构建文档合并链（stuff documents chain），所有查询共用
+
+    检索只在 process_query 中执行一次，检索到的文档直接作为 context 传入，
+    因此每次查询的开销只有一次检索 + 一次 LLM 调用
+    """
+    return create_stuff_documents_chain(get_chat_model(cohere_api_key), RETRIEVAL_QA_PROMPT)
 
-# 初始化 Cohere 聊天模型
-# 使用 Command-r7b-12-2024 模型进行对话生成
-chat_model = ChatCohere(model="command-r7b-12-2024",
-                       temperature=0.1,  # 较低的温度保证答案的一致性
-                       max_tokens=512,   # 限制单次回答的最大长度
-                       verbose=True,     # 启用详细日志
-                       cohere_api_key=st.session_state.cohere_api_key)
+
+chat_model = get_chat_model(st.session_state.cohere_api_key)
 
 # 初始化 Qdrant 客户端
 client = init_qdrant()
@@ -219,6 +297,9 @@ def process_document(file):
         # chunk_overlap=200: 相邻文本块的重叠长度，保证上下文连续性
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         texts = text_splitter.split_documents(documents)
+        # 记录原始文件名作为来源（临时路径每次都不同），用于生成内容寻址的块 ID
+        for text in texts:
+            text.metadata["file_name"] = file.name
         
         # 清理临时文件
         os.unlink(tmp_path)
@@ -230,6 +311,9 @@ def process_document(file):
 
 # Qdrant 集合名称常量
 COLLECTION_NAME = "cohere_rag"
+# 检索数量：不重排时直接取 RETRIEVAL_K 个块；重排时先召回 RERANK_FETCH_K 个候选
+RETRIEVAL_K = 10
+RERANK_FETCH_K = 30
 
 def create_vector_stores(texts):
     """
@@ -238,7 +322,7 @@ def create_vector_stores(texts):
     功能：
         - 在 Qdrant 中创建新的集合（如果不存在）
         - 配置向量维度和距离度量方式
-        - 将文档文本转换为向量并存储
+        - 将文档文本转换为向量并存储（内容寻址 ID，重复块不会重复嵌入）
         - 提供用户反馈和错误处理
     
     参数：
@@ -252,10 +336,10 @@ def create_vector_stores(texts):
             # 创建 Qdrant 集合
             # size=1024: Cohere embed-english-v3.0 模型的向量维度
             # distance=COSINE: 使用余弦相似度进行向量比较
+            # QDRANT_PROFILE: float32 / scalar（int8 量化）/ binary（二值量化），量化副本常驻内存，原始向量落盘
             client.create_collection(collection_name=COLLECTION_NAME,
-                                   vectors_config=VectorParams(size=1024,
-                                                            distance=Distance.COSINE))
-            st.success(f"Created new collection: {COLLECTION_NAME}")
+                                   **collection_config(1024))
+            st.success(f"Created new collection: {COLLECTION_NAME} ({get_profile()['name']} profile)")
         except Exception as e:
             # 如果集合已存在，忽略错误
             if "already exists" not in str(e).lower():
@@ -267,9 +351,11 @@ def create_vector_stores(texts):
                                        embedding=embedding)
         
         # 批量添加文档到向量存储
+        # 块 ID 由 来源 + 规范化文本 的哈希生成：重复上传时已存在的块直接跳过，不再嵌入
         with st.spinner('Storing documents in Qdrant...'):
-            vector_store.add_documents(texts)
+            stats = upsert_new_documents(vector_store, texts)
             st.success("Documents successfully stored in Qdrant!")
+            st.caption(format_upsert_stats(stats))
         
         return vector_store
         
@@ -295,12 +381,17 @@ class RateLimitedDuckDuckGo(DuckDuckGoSearchRun):
     
     功能：
         - 继承自 DuckDuckGoSearchRun
-        - 添加重试机制和速率限制处理
-        - 自动处理搜索 API 的速率限制错误
+        - 所有会话共享一个进程级令牌桶：只有预算真正用完时才等待（不再每次固定 sleep 2 秒）
+        - 相同的并发查询合并为一次请求，结果按 TTL 缓存
+        - 遇到速率限制错误时清空令牌桶并退避重试
+        - 支持同步（run/invoke）和异步（arun/ainvoke）调用
     """
-    @retry(wait=wait_exponential(multiplier=1, min=4, max=10),
-           stop=stop_after_attempt(3))
-    def run(self, query: str) -> str:
+
+    def _limiter(self):
+        # 基类的 _run 才是真正的上游请求；进程内所有实例共享同一个限流器
+        return get_rate_limited_search("duckduckgo", lambda q: DuckDuckGoSearchRun._run(self, q))
+
+    def _run(self, query: str, run_manager=None) -> str:
         """
         执行带速率限制的搜索
         
@@ -310,16 +401,32 @@ class RateLimitedDuckDuckGo(DuckDuckGoSearchRun):
         返回：
             str: 搜索结果
         """
-        try:
-            sleep(2)  # 在请求之间添加延迟
-            return super().run(query)
-        except Exception as e:
-            if "Ratelimit" in str(e):
-                sleep(5)  # 遇到速率限制时等待更长时间
-                return super().run(query)
-            raise e
-
-def create_fallback_agent(chat_model: BaseLanguageModel):
+        return self._limiter().search(query)
+
+    async def _arun(self, query: str, run_manager=None) -> str:
+        return await self._limiter().asearch(query)
+
+    def search_with_timeout(self, query: str, timeout: float) -> str:
+        """同 _run，但最多等待 timeout 秒（超时抛出 concurrent.futures.TimeoutError）"""
+        return self._limiter().search(query, timeout=timeout)
+
+# 网络回退智能体的预算：最长耗时、最多搜索次数，以及“证据足够”即提前停止的阈值
+FALLBACK_MAX_SECONDS = float(os.getenv("FALLBACK_MAX_SECONDS", "45"))
+FALLBACK_MAX_TOOL_CALLS = int(os.getenv("FALLBACK_MAX_TOOL_CALLS", "3"))
+FALLBACK_MIN_EVIDENCE_CHARS = int(os.getenv("FALLBACK_MIN_EVIDENCE_CHARS", "2000"))
+# 回退路径中每次 LLM 请求的超时；最终总结在截止时间之后运行，也受此限制
+FALLBACK_LLM_TIMEOUT_SEC = float(os.getenv("FALLBACK_LLM_TIMEOUT_SEC", "20"))
+# 超出搜索预算后允许智能体额外进行的轮数（工具会直接返回“预算用完”），避免触发递归上限
+FALLBACK_EXTRA_STEPS = 2
+# create_react_agent 在最后一步仍想调用工具时返回的固定回复
+NEED_MORE_STEPS_REPLY = "Sorry, need more steps to process this request."
+BUDGET_EXHAUSTED_NOTE = ("Research budget exhausted. Do not call any more tools; "
+                         "write the final answer now from the evidence above.")
+ENOUGH_EVIDENCE_NOTE = ("You now have enough evidence. Do not search again; "
+                        "write the final answer now.")
+
+
+def create_fallback_agent(chat_model: BaseLanguageModel, budget: dict = None):
     """
     创建用于网络研究的 LangGraph 智能体
     
@@ -327,14 +434,20 @@ def create_fallback_agent(chat_model: BaseLanguageModel):
         - 创建网络搜索工具
         - 配置 ReAct 智能体进行复杂推理
         - 提供搜索失败时的优雅降级
+        - 按预算执行：超过最长耗时或最多搜索次数后，工具不再搜索而是要求智能体直接作答；
+          收集到足够证据（FALLBACK_MIN_EVIDENCE_CHARS）后提前停止
     
     参数：
         chat_model: 用于智能体推理的语言模型
+        budget (dict): 预算状态，包含 deadline / max_tool_calls / tool_calls / evidence_chars，
+                       由 run_budgeted_fallback 创建；为 None 时不限制
     
     返回：
         LangGraph Agent: 配置好的智能体实例
     """
     
+    search = RateLimitedDuckDuckGo()
+
     def web_research(query: str) -> str:
         """
         网络搜索工具函数
@@ -345,13 +458,29 @@ def create_fallback_agent(chat_model: BaseLanguageModel):
         返回：
             str: 格式化的搜索结果
         """
+        timeout = None
+        if budget is not None:
+            remaining = budget["deadline"] - time.perf_counter()
+            if budget["tool_calls"] >= budget["max_tool_calls"] or remaining <= 0:
+                return BUDGET_EXHAUSTED_NOTE
+            budget["tool_calls"] += 1
+            # 单次搜索不能超过剩余时间
+            timeout = remaining
         try:
-            # 创建搜索工具，限制结果数量
-            search = DuckDuckGoSearchRun(num_results=5)
-            results = search.run(query)
-            return results
+            # 限流 + 合并重复请求 + TTL 缓存的搜索工具
+            if timeout is None:
+                results = search.invoke(query)
+            else:
+                results = search.search_with_timeout(query, timeout)
+        except FutureTimeoutError:
+            return f"Search timed out. {BUDGET_EXHAUSTED_NOTE}"
         except Exception as e:
             return f"Search failed: {str(e)}. Providing answer based on general knowledge."
+        if budget is not None:
+            budget["evidence_chars"] += len(results)
+            if budget["evidence_chars"] >= budget["min_evidence_chars"]:
+                return f"{results}\n\n{ENOUGH_EVIDENCE_NOTE}"
+        return results
 
     # 定义智能体可用的工具列表
     tools = [web_research]
@@ -364,6 +493,112 @@ def create_fallback_agent(chat_model: BaseLanguageModel):
     
     return agent
 
+
+def _stream_agent(agent, agent_input: dict, config: dict, updates: queue.Queue):
+    """在后台线程中运行智能体，把每个节点的更新放入队列（调用方据此按截止时间停止等待）"""
+    try:
+        for update in agent.stream(agent_input, config=config, stream_mode="updates"):
+            updates.put(("update", update))
+        updates.put(("done", None))
+    except Exception as e:
+        updates.put(("error", e))
+
+
+def run_budgeted_fallback(chat_model: BaseLanguageModel, query: str,
+                          max_seconds: float = FALLBACK_MAX_SECONDS,
+                          max_tool_calls: int = FALLBACK_MAX_TOOL_CALLS,
+                          min_evidence_chars: int = FALLBACK_MIN_EVIDENCE_CHARS) -> tuple[str, list]:
+    """
+    在延迟和工具调用预算内运行网络回退智能体
+
+    智能体在后台线程中运行，主线程最多等待到截止时间，单个慢搜索或慢 LLM 调用不会让等待超时；
+    超时、触发递归上限或智能体返回 "need more steps" 时，用已收集的证据做一次总结作答。
+
+    参数：
+        chat_model: 语言模型（应设置请求超时，见 FALLBACK_LLM_TIMEOUT_SEC）
+        query (str): 用户查询
+        max_seconds (float): 最长墙钟时间，超时后停止智能体并用已收集的证据直接作答
+        max_tool_calls (int): 最多搜索次数
+        min_evidence_chars (int): 证据达到该长度后提示智能体停止搜索
+
+    返回：
+        tuple[str, list]: (答案, 每一步的耗时记录)
+    """
+    start = time.perf_counter()
+    deadline = start + max_seconds
+    budget = {"deadline": deadline, "max_tool_calls": max_tool_calls,
+              "tool_calls": 0, "evidence_chars": 0, "min_evidence_chars": min_evidence_chars}
+    agent = create_fallback_agent(chat_model, budget)
+    agent_input = {
+        "messages": [
+            HumanMessage(content=f"""Research the question: '{query}' using at most {max_tool_calls} web searches, then answer it accurately and concisely (around 200 words), citing the sources you used.""")
+        ],
+        "is_last_step": False
+    }
+    # 每轮搜索 = 一步推理 + 一步工具，另留 FALLBACK_EXTRA_STEPS 轮余量和一步最终回答
+    config = {"recursion_limit": 2 * (max_tool_calls + FALLBACK_EXTRA_STEPS) + 1}
+
+    updates = queue.Queue()
+    threading.Thread(target=_stream_agent, args=(agent, agent_input, config, updates),
+                     name="fallback-agent", daemon=True).start()
+
+    steps = []
+    messages = []
+    stop_reason = None
+    last = start
+    while True:
+        try:
+            kind, payload = updates.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            # 后台线程可能仍在等待搜索或 LLM；工具看到截止时间已过，不会再发起新的搜索
+            stop_reason = f"wall-clock budget of {max_seconds:.0f}s reached"
+            break
+        if kind == "done":
+            break
+        if kind == "error":
+            if isinstance(payload, GraphRecursionError):
+                stop_reason = "recursion limit reached"
+                break
+            raise payload
+
+        now = time.perf_counter()
+        for node, value in payload.items():
+            new_messages = value.get("messages", []) if isinstance(value, dict) else []
+            messages.extend(new_messages)
+            tool_calls = [c["name"] for m in new_messages for c in (getattr(m, "tool_calls", None) or [])]
+            steps.append({
+                "Step": len(steps) + 1,
+                "Node": node,
+                "Seconds": round(now - last, 2),
+                "Detail": ", ".join(tool_calls) or (str(new_messages[-1].content)[:80] if new_messages else ""),
+            })
+        last = now
+
+    final = messages[-1] if messages else None
+    if stop_reason is None and (final is None or not isinstance(final, AIMessage)
+                                or getattr(final, "tool_calls", None)):
+        stop_reason = "agent stopped without an answer"
+    if stop_reason is None and str(final.content).strip() == NEED_MORE_STEPS_REPLY:
+        stop_reason = "agent ran out of steps"
+
+    if stop_reason is None:
+        return final.content, steps
+
+    # 智能体被提前停止：用已收集的搜索结果做一次总结作答
+    steps.append({"Step": len(steps) + 1, "Node": "stopped", "Seconds": 0.0, "Detail": stop_reason})
+    evidence = "\n\n".join(
+        str(m.content) for m in messages
+        if isinstance(m, ToolMessage) and not str(m.content).startswith((BUDGET_EXHAUSTED_NOTE, "Search "))
+    )
+    synth_start = time.perf_counter()
+    answer = chat_model.invoke(
+        f"Answer the question '{query}' concisely using this web evidence:\n\n{evidence or 'No web evidence was found.'}"
+    ).content
+    steps.append({"Step": len(steps) + 1, "Node": "synthesize",
+                  "Seconds": round(time.perf_counter() - synth_start, 2), "Detail": "answer from partial evidence"})
+    return answer, steps
+
+
 def process_query(vectorstore, query) -> tuple[str, list]:
     """
     处理用户查询，支持 RAG 检索和网络搜索回退
@@ -386,60 +621,56 @@ def process_query(vectorstore, query) -> tuple[str, list]:
         # similarity_score_threshold: 使用相似度阈值过滤
         # k=10: 最多检索 10 个相关文档
         # score_threshold=0.7: 相似度阈值为 0.7，过滤不相关的文档
+        # 启用重排序时多召回候选（RERANK_FETCH_K），再由交叉编码器筛选
         retriever = vectorstore.as_retriever(
             search_type="similarity_score_threshold",
             search_kwargs={
-                "k": 10,
-                "score_threshold": 0.7
+                "k": RERANK_FETCH_K if st.session_state.rerank_enabled else RETRIEVAL_K,
+                "score_threshold": 0.7,
+                # 量化集合：对过采样的候选用原始向量重新打分（float32 时为 None）
+                "search_params": search_params()
             }
         )
 
         # 获取相关文档
-        relevant_docs = retriever.get_relevant_documents(query)
+        relevant_docs = retriever.invoke(query)
 
         if relevant_docs:
             # 如果找到相关文档，使用 RAG 生成答案
             
-            # 从 LangChain Hub 获取预定义的 RAG 提示模板
-            retrieval_qa_prompt = hub.pull("langchain-ai/retrieval-qa-chat")
-            
-            # 创建文档合并链，将多个文档合并为上下文
-            combine_docs_chain = create_stuff_documents_chain(chat_model, retrieval_qa_prompt)
-            
-            # 创建检索链，结合检索器和文档合并链
-            retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
+            if st.session_state.rerank_enabled:
+                # 重排序后只把预算内的块放进提示词，并展示重排耗时与节省的 token
+                relevant_docs, rerank_stats = rerank_documents(
+                    query, relevant_docs, top_n=RETRIEVAL_K,
+                    token_budget=st.session_state.context_token_budget, baseline_k=RETRIEVAL_K
+                )
+                st.caption(format_rerank_stats(rerank_stats))
             
-            # 执行 RAG 查询
-            response = retrieval_chain.invoke({"input": query})
-            return response['answer'], relevant_docs
+            # 使用预先构建的文档合并链：同一批检索结果既用于相关性判断，也作为回答的上下文
+            answer = get_combine_docs_chain(st.session_state.cohere_api_key).invoke(
+                {"input": query, "context": relevant_docs}
+            )
+            return answer, relevant_docs
             
         else:
             # 如果未找到相关文档，回退到网络搜索
             st.info("No relevant documents found. Searching web...")
-            fallback_agent = create_fallback_agent(chat_model)
             
             with st.spinner('Researching...'):
-                # 构造智能体输入
-                agent_input = {
-                    "messages": [
-                        HumanMessage(content=f"""Please thoroughly research the question: '{query}' and provide a detailed and comprehensive response. Make sure to gather the latest information from credible sources. Minimum 400 words.""")
-                    ],
-                    "is_last_step": False
-                }
-                
-                # 配置智能体执行参数
-                config = {"recursion_limit": 100}
-                
                 try:
-                    # 执行智能体研究
-                    response = fallback_agent.invoke(agent_input, config=config)
+                    # 在预算内执行智能体研究（耗时 / 搜索次数 / 证据充足即停止）
+                    fallback_start = time.perf_counter()
+                    # 回退路径使用带较短请求超时的模型，保证单次 LLM 调用不会拖垮时间预算
+                    answer, steps = run_budgeted_fallback(
+                        get_chat_model(st.session_state.cohere_api_key, FALLBACK_LLM_TIMEOUT_SEC), query
+                    )
+                    
+                    # 展示每一步的耗时，便于定位时间花在哪里
+                    with st.expander(f"⏱️ Web research: {len(steps)} steps, "
+                                     f"{time.perf_counter() - fallback_start:.1f}s"):
+                        st.dataframe(steps, hide_index=True)
                     
-                    # 提取智能体生成的答案
-                    if isinstance(response, dict) and "messages" in response:
-                        last_message = response["messages"][-1]
-                        answer = last_message.content if hasattr(last_message, 'content') else str(last_message)
-                        
-                        return f"""Web Search Result:
+                    return f"""Web Search Result:
 {answer}
 """, []
                     
@@ -452,29 +683,68 @@ def process_query(vectorstore, query) -> tuple[str, list]:
         st.error(f"Error: {str(e)}")
         return "I encountered an error. Please try rephrasing your question.", []
 
-def post_process(answer, sources):
+@st.cache_resource
+def get_summary_executor() -> ThreadPoolExecutor:
+    """进程内共享的摘要线程池：摘要在后台生成，不阻塞完整答案的展示"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="answer-summary")
+
+
+@st.cache_resource
+def get_summary_cache() -> dict:
+    """按答案哈希缓存的摘要（跨会话、跨重跑共享）"""
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+
+def summarize_answer(model: BaseLanguageModel, answer: str, cache: dict = None) -> str:
+    """
+    生成答案的 2-3 句摘要；传入 cache 时按答案的 sha256 复用已有摘要
+
+    注意：在后台线程中执行，不能调用任何 st.* 接口（cache 由调用方在主线程获取）
+    """
+    key = hashlib.sha256(answer.encode("utf-8")).hexdigest()
+    if cache is not None:
+        with cache["lock"]:
+            if key in cache["entries"]:
+                cache["entries"].move_to_end(key)
+                return cache["entries"][key]
+
+    summary_prompt = f"Summarize the following answer in 2-3 sentences: {answer}"
+    summary = model.invoke(summary_prompt).content
+
+    if cache is not None:
+        with cache["lock"]:
+            cache["entries"][key] = summary
+            while len(cache["entries"]) > SUMMARY_CACHE_MAX_ENTRIES:
+                cache["entries"].popitem(last=False)
+    return summary
+
+
+def post_process(answer, sources, summarize: bool = True, use_cache: bool = True):
     """
     后处理答案和来源信息
     
     功能：
-        - 对过长的答案进行摘要
+        - 对过长的答案在后台线程中生成摘要（不阻塞完整答案的展示）
         - 格式化来源文档信息
         - 提供清晰的信息展示
     
     参数：
         answer (str): 原始答案
         sources (list): 来源文档列表
+        summarize (bool): 是否为长答案生成摘要
+        use_cache (bool): 是否按答案哈希复用已生成的摘要
     
     返回：
-        tuple: (处理后的答案, 格式化的来源列表)
+        tuple: (处理后的答案, 格式化的来源列表, 摘要 Future 或 None)
     """
     answer = answer.strip()
 
-    # 对超过 500 字符的答案进行摘要
-    if len(answer) > 500:
-        summary_prompt = f"Summarize the following answer in 2-3 sentences: {answer}"
-        summary = chat_model.invoke(summary_prompt).content
-        answer = f"{summary}\n\nFull Answer: {answer}"
+    # 对超过 SUMMARY_MIN_CHARS 字符的答案提交后台摘要任务，调用方可先展示完整答案
+    summary_future = None
+    if summarize and len(answer) > SUMMARY_MIN_CHARS:
+        summary_future = get_summary_executor().submit(
+            summarize_answer, chat_model, answer, get_summary_cache() if use_cache else None
+        )
     
     # 格式化来源信息
     formatted_sources = []
@@ -482,7 +752,7 @@ def post_process(answer, sources):
         # 截取前 200 个字符作为预览
         formatted_source = f"{i}. {source.page_content[:200]}..."
         formatted_sources.append(formatted_source)
-    return answer, formatted_sources
+    return answer, formatted_sources, summary_future
 
 # ================================
 # Streamlit 用户界面部分
@@ -524,18 +794,35 @@ if query := st.chat_input("Ask a question about the document:"):
             try:
                 # 处理查询并获取答案
                 answer, sources = process_query(st.session_state.vectorstore, query)
+                answer, formatted_sources, summary_future = post_process(
+                    answer, sources,
+                    summarize=st.session_state.summarize_enabled,
+                    use_cache=st.session_state.summary_cache_enabled,
+                )
+
+                # 完整答案立即展示，摘要在后台生成后再补充到下方
                 st.markdown(answer)
                 
                 # 显示来源信息
-                if sources:
+                if formatted_sources:
                     with st.expander("Sources"):
-                        for source in sources:
-                            st.markdown(f"- {source.page_content[:200]}...")
+                        for source in formatted_sources:
+                            st.markdown(source)
+
+                content = answer
+                if summary_future is not None:
+                    with st.spinner("Summarizing..."):
+                        try:
+                            summary = summary_future.result()
+                            st.info(f"**Summary:** {summary}")
+                            content = f"{answer}\n\n**Summary:** {summary}"
+                        except Exception as summary_error:
+                            st.caption(f"Summary unavailable: {summary_error}")
                 
                 # 添加 AI 回复到历史记录
                 st.session_state.chat_history.append({
                     "role": "assistant",
-                    "content": answer
+                    "content": content
                 })
                 
             except Exception as e:
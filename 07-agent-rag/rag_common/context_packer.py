@@ -0,0 +1,130 @@
+"""
+Token-budgeted context packing for RAG prompts in 07-agent-rag.
+
+`pack_context` turns scored chunks into one context string that:
+    - drops exact/contained duplicates and strips the text two chunks share at a
+      boundary (RecursiveCharacterTextSplitter's chunk_overlap)
+    - keeps the highest-scored chunks that fit the token budget
+    - emits them in a stable (source, position) order, so the same retrieved set
+      always yields the same prompt prefix and provider/Ollama prefix caches hit
+
+Token counts use tiktoken when it is installed, otherwise ~4 characters per token.
+"""
+
+import hashlib
+from collections import namedtuple
+from typing import Callable, Dict, List, Sequence
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional (and needs its BPE file on first use)
+    _encoding = None
+
+# `position` orders chunks within a source (page, start_index, ...); any sortable value
+ScoredChunk = namedtuple("ScoredChunk", ["text", "score", "source", "position"])
+
+MIN_OVERLAP_CHARS = 30
+MAX_OVERLAP_CHARS = 500
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]) + " …"
+    return text[:max_tokens * 4] + " …"
+
+
+def _boundary_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    longest = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def chunks_from_documents(documents: Sequence, scores: Sequence[float] = None) -> List[ScoredChunk]:
+    """Wrap LangChain documents; without scores, earlier documents rank higher."""
+    chunks = []
+    for rank, doc in enumerate(documents):
+        metadata = doc.metadata or {}
+        source = str(metadata.get("file_name") or metadata.get("url") or metadata.get("source") or "")
+        position = (metadata.get("page", 0), metadata.get("start_index", 0))
+        score = scores[rank] if scores is not None else -rank
+        chunks.append(ScoredChunk(doc.page_content, score, source, position))
+    return chunks
+
+
+def pack_context(chunks: Sequence[ScoredChunk], token_budget: int, separator: str = "\n\n",
+                 token_counter: Callable[[str], int] = count_tokens) -> Dict:
+    """
+    Pack chunks into at most `token_budget` tokens.
+
+    Returns:
+        dict: text, tokens, kept, dropped, deduped_chars and tokens_unpacked
+        (what a plain join of all chunks would have cost).
+    """
+    tokens_unpacked = token_counter(separator.join(c.text for c in chunks)) if chunks else 0
+    ranked = sorted(chunks, key=lambda c: c.score, reverse=True)
+
+    kept = []
+    used = 0
+    deduped_chars = 0
+    separator_tokens = token_counter(separator)
+    for chunk in ranked:
+        original = chunk.text.strip()
+        text = original
+        # Trim text shared with neighbouring chunks of the same source
+        for other in kept:
+            if other.source != chunk.source:
+                continue
+            head = _boundary_overlap(other.text, text)
+            if head:
+                text = text[head:].lstrip()
+            tail = _boundary_overlap(text, other.text)
+            if tail:
+                text = text[:-tail].rstrip()
+        # Exact duplicates and chunks already covered by a kept one add nothing
+        if not text or any(text in other.text for other in kept):
+            continue
+
+        tokens = token_counter(text) + (separator_tokens if kept else 0)
+        if used + tokens > token_budget:
+            if kept:
+                continue
+            # The best chunk alone is over budget: keep a truncated copy rather than nothing
+            text = truncate_to_tokens(text, token_budget)
+            original = text
+            tokens = token_counter(text)
+        kept.append(chunk._replace(text=text))
+        used += tokens
+        deduped_chars += max(0, len(original) - len(text))
+
+    ordered = sorted(
+        kept,
+        key=lambda c: (c.source, c.position, hashlib.sha256(c.text.encode("utf-8")).hexdigest()),
+    )
+    text = separator.join(c.text for c in ordered)
+    return {
+        "text": text,
+        "tokens": token_counter(text) if text else 0,
+        "kept": len(kept),
+        "dropped": len(chunks) - len(kept),
+        "deduped_chars": deduped_chars,
+        "tokens_unpacked": tokens_unpacked,
+    }
+
+
+def format_pack_stats(stats: Dict) -> str:
+    return (f"📦 Context: {stats['kept']} chunks, ~{stats['tokens']} tokens "
+            f"(unpacked ~{stats['tokens_unpacked']}, {stats['dropped']} dropped, "
+            f"{stats['deduped_chars']} overlapping chars removed)")
@@ -0,0 +1,223 @@
+"""
+Persistent embedding cache shared by the RAG demos in 07-agent-rag.
+
+Vectors are stored in one SQLite file (float32 blobs) keyed by (model, sha256(text)),
+so identical text is embedded once no matter which app, run or process asks for it.
+Least recently used rows are evicted beyond `max_entries`.
+
+Wrappers:
+    - CachedEmbeddings: any LangChain `Embeddings` (Ollama, Cohere, ...)
+    - CachedLlamaIndexEmbedding: any LlamaIndex `BaseEmbedding` (OpenAIEmbedding, ...)
+    - cached_embedding_fn: a plain `text -> vector` function
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "agent101", "embeddings.sqlite"),
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed (model, text hash) -> float32 vector store with hit-rate metrics."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "entries": self._size}
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        hashes = [_text_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits bound parameters, so look up in slices
+            for start in range(0, len(hashes), 500):
+                chunk = list(set(hashes[start:start + 500]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+
+            results = []
+            for h in hashes:
+                blob = found.get(h)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(array("f", blob).tolist())
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(model, _text_hash(t), array("f", v).tobytes(), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._size += self._conn.total_changes - before
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        overflow = self._size - self.max_entries
+        if overflow <= 0:
+            return
+        # Trim a little extra so eviction doesn't run on every insert
+        overflow += self.max_entries // 100
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (overflow,),
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_or_compute(self, model: str, texts: List[str], compute) -> List[List[float]]:
+        """Return vectors for `texts`, calling `compute(missing_texts)` only for cache misses."""
+        vectors = self.get_many(model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Embed each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique, compute(unique)))
+            self.put_many(model, unique, [computed[t] for t in unique])
+            for i in missing:
+                vectors[i] = computed[texts[i]]
+        return vectors
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> EmbeddingCache:
+    """Process-wide cache instance at DEFAULT_CACHE_PATH."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def cached_embedding_fn(fn, model_name: str, cache: EmbeddingCache = None):
+    """Wrap a `text -> vector` function with the persistent cache."""
+    def wrapper(text: str):
+        store = cache or get_default_cache()
+        return store.get_or_compute(model_name, [text], lambda texts: [fn(t) for t in texts])[0]
+    return wrapper
+
+
+# ---------- LangChain ---------- #
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # LangChain is optional (the math agent only uses LlamaIndex)
+    Embeddings = None
+
+if Embeddings is not None:
+    class CachedEmbeddings(Embeddings):
+        """
+        Transparent cache around a LangChain `Embeddings` object.
+
+        Documents and queries are cached separately because some providers (e.g. Cohere)
+        embed them with different input types.
+        """
+
+        def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache = None):
+            self.embeddings = embeddings
+            self.model_name = model_name
+            self.cache = cache or get_default_cache()
+
+        def embed_documents(self, texts: List[str]) -> List[List[float]]:
+            return self.cache.get_or_compute(f"{self.model_name}:document", texts, self.embeddings.embed_documents)
+
+        def embed_query(self, text: str) -> List[float]:
+            return self.cache.get_or_compute(
+                f"{self.model_name}:query", [text], lambda texts: [self.embeddings.embed_query(texts[0])]
+            )[0]
+
+
+# ---------- LlamaIndex ---------- #
+try:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from pydantic import PrivateAttr
+except ImportError:  # LlamaIndex is optional (the LangChain apps don't install it)
+    BaseEmbedding = None
+
+if BaseEmbedding is not None:
+    class CachedLlamaIndexEmbedding(BaseEmbedding):
+        """Transparent cache around a LlamaIndex embedding model."""
+
+        _inner: BaseEmbedding = PrivateAttr()
+        _cache: EmbeddingCache = PrivateAttr()
+
+        def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache = None, **kwargs):
+            super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+            self._inner = inner
+            self._cache = cache or get_default_cache()
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "CachedLlamaIndexEmbedding"
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return self._cache.get_or_compute(
+                f"{self.model_name}:query", [query], lambda texts: [self._inner.get_query_embedding(texts[0])]
+            )[0]
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._get_text_embeddings([text])[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            return self._cache.get_or_compute(
+                f"{self.model_name}:document", texts, self._inner.get_text_embedding_batch
+            )
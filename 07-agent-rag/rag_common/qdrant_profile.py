@@ -0,0 +1,118 @@
+"""
+Qdrant collection profiles for the RAG demos in 07-agent-rag.
+
+A profile decides how a new collection stores and indexes its vectors:
+    - "float32": plain float32 vectors in RAM (Qdrant defaults, the previous behaviour)
+    - "scalar":  int8 scalar quantization kept in RAM, original vectors on disk,
+                 queries rescore the oversampled candidates with the originals (~4x less RAM)
+    - "binary":  1-bit binary quantization in RAM, originals on disk, heavier
+                 oversampling + rescoring (~32x less RAM; best for >=1024-d embeddings)
+
+Pick one with QDRANT_PROFILE; QDRANT_ON_DISK, QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT,
+QDRANT_HNSW_EF and QDRANT_OVERSAMPLING override the per-profile defaults. A profile only
+applies when a collection is created; use `apply_profile` to convert an existing one.
+"""
+
+import os
+from typing import Dict, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+QDRANT_PROFILE = os.getenv("QDRANT_PROFILE", "float32")
+
+PROFILES = {
+    "float32": {"quantization": None, "on_disk": False, "oversampling": None},
+    "scalar": {"quantization": "scalar", "on_disk": True, "oversampling": 1.5},
+    "binary": {"quantization": "binary", "on_disk": True, "oversampling": 3.0},
+}
+# ef_construct above Qdrant's default 100: a better graph (recall) for a little more build time
+HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "200"))
+HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "128"))
+
+
+def get_profile(name: Optional[str] = None) -> Dict:
+    name = name or QDRANT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown Qdrant profile {name!r}; expected one of {', '.join(PROFILES)}")
+    profile = dict(PROFILES[name], name=name)
+    if os.getenv("QDRANT_ON_DISK"):
+        profile["on_disk"] = os.getenv("QDRANT_ON_DISK").lower() == "true"
+    if os.getenv("QDRANT_OVERSAMPLING") and profile["quantization"]:
+        profile["oversampling"] = float(os.getenv("QDRANT_OVERSAMPLING"))
+    return profile
+
+
+def _quantization_config(profile: Dict):
+    # always_ram: the quantized copy stays in memory even when the originals live on disk
+    if profile["quantization"] == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99,
+                                                                   always_ram=True))
+    if profile["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def collection_config(size: int, profile: Optional[str] = None, distance: Distance = Distance.COSINE) -> Dict:
+    """Keyword arguments for `QdrantClient.create_collection` under `profile`."""
+    profile = get_profile(profile)
+    return {
+        "vectors_config": VectorParams(size=size, distance=distance, on_disk=profile["on_disk"]),
+        "quantization_config": _quantization_config(profile),
+        "hnsw_config": HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+    }
+
+
+def search_params(profile: Optional[str] = None) -> Optional[SearchParams]:
+    """Query-time parameters: rescore oversampled quantized candidates with the original vectors."""
+    profile = get_profile(profile)
+    if not profile["quantization"]:
+        return None
+    return SearchParams(
+        hnsw_ef=HNSW_EF,
+        quantization=QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"]),
+    )
+
+
+def ensure_collection(client: QdrantClient, collection_name: str, size: int,
+                      profile: Optional[str] = None) -> bool:
+    """Create `collection_name` with `profile` unless it exists; returns True if it was created."""
+    if client.collection_exists(collection_name=collection_name):
+        return False
+    client.create_collection(collection_name=collection_name, **collection_config(size, profile))
+    return True
+
+
+def apply_profile(client: QdrantClient, collection_name: str, profile: Optional[str] = None):
+    """Switch an existing collection to `profile`; Qdrant re-indexes in the background."""
+    profile = get_profile(profile)
+    client.update_collection(
+        collection_name=collection_name,
+        # "" is the unnamed (default) vector used by every collection in these demos
+        vectors_config={"": VectorParamsDiff(on_disk=profile["on_disk"])},
+        quantization_config=_quantization_config(profile) or Disabled.DISABLED,
+        hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+    )
+
+
+def estimate_vector_ram(points: int, size: int, profile: Optional[str] = None) -> Dict:
+    """Approximate bytes of vector data held in RAM vs on disk (HNSW links excluded)."""
+    profile = get_profile(profile)
+    original = points * size * 4
+    quantized = {"scalar": points * size, "binary": points * size // 8}.get(profile["quantization"], 0)
+    in_ram = quantized + (0 if profile["on_disk"] else original)
+    return {"ram_bytes": in_ram, "disk_bytes": original if profile["on_disk"] else 0}
@@ -0,0 +1,138 @@
+"""
+Process-wide rate limiting for external search APIs used by the 07-agent-rag demos.
+
+`RateLimitedSearch` wraps a blocking `query -> str` function with:
+    - a token bucket shared by every thread/session: calls only wait when the
+      budget is actually exhausted (no fixed sleep per request)
+    - request coalescing: identical concurrent queries share one upstream call
+    - a TTL result cache
+    - a back-off that empties the bucket when the provider reports a rate limit
+Calls run on one background event loop, so both sync (`search`) and async
+(`asearch`) callers, from any thread or loop, share the same state.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+SEARCH_RATE_PER_SEC = float(os.getenv("SEARCH_RATE_PER_SEC", "0.5"))
+SEARCH_BURST = int(os.getenv("SEARCH_BURST", "3"))
+SEARCH_CACHE_TTL_SEC = float(os.getenv("SEARCH_CACHE_TTL_SEC", "900"))
+SEARCH_CACHE_MAX_ENTRIES = 512
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `reserve()` takes a token and returns how long to wait for it."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            # A negative balance is a queue: each waiter is one refill interval behind the previous
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def penalize(self, seconds: float):
+        """Provider said "slow down": nothing may be spent for `seconds`."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class RateLimitedSearch:
+    def __init__(self, search_fn: Callable[[str], str], rate: float = SEARCH_RATE_PER_SEC,
+                 burst: int = SEARCH_BURST, ttl_sec: float = SEARCH_CACHE_TTL_SEC,
+                 rate_limit_backoff_sec: float = 5.0, max_retries: int = 2):
+        self.search_fn = search_fn
+        self.bucket = TokenBucket(rate, burst)
+        self.ttl_sec = ttl_sec
+        self.rate_limit_backoff_sec = rate_limit_backoff_sec
+        self.max_retries = max_retries
+        self.stats = {"calls": 0, "upstream": 0, "cache_hits": 0, "coalesced": 0, "waited_sec": 0.0}
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="rate-limited-search", daemon=True).start()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    async def _fetch(self, query: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            wait = self.bucket.reserve()
+            if wait:
+                self.stats["waited_sec"] += wait
+                await asyncio.sleep(wait)
+            self.stats["upstream"] += 1
+            try:
+                return await self._loop.run_in_executor(None, self.search_fn, query)
+            except Exception as e:
+                if "ratelimit" not in str(e).lower().replace(" ", "") or attempt == self.max_retries:
+                    raise
+                self.bucket.penalize(self.rate_limit_backoff_sec * (attempt + 1))
+
+    def _submit(self, query: str) -> Future:
+        key = self._key(query)
+        with self._lock:
+            self.stats["calls"] += 1
+            cached = self._cache.get(key)
+            if cached is not None and time.time() - cached[0] < self.ttl_sec:
+                self.stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(cached[1])
+                return future
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            future = asyncio.run_coroutine_threadsafe(self._fetch(query), self._loop)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if not future.cancelled() and future.exception() is None:
+                self._cache[key] = (time.time(), future.result())
+                self._cache.move_to_end(key)
+                while len(self._cache) > SEARCH_CACHE_MAX_ENTRIES:
+                    self._cache.popitem(last=False)
+
+    def search(self, query: str, timeout: float = None) -> str:
+        """Blocking search; raises concurrent.futures.TimeoutError after `timeout` seconds
+        (the upstream call keeps running and still fills the cache)."""
+        return self._submit(query).result(timeout=timeout)
+
+    async def asearch(self, query: str) -> str:
+        return await asyncio.wrap_future(self._submit(query))
+
+
+_searches: Dict[str, RateLimitedSearch] = {}
+_searches_lock = threading.Lock()
+
+
+def get_rate_limited_search(name: str, search_fn: Callable[[str], str], **kwargs) -> RateLimitedSearch:
+    """Process-wide limiter per provider `name` (the first registration's settings win)."""
+    with _searches_lock:
+        if name not in _searches:
+            _searches[name] = RateLimitedSearch(search_fn, **kwargs)
+        return _searches[name]
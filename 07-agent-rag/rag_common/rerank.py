@@ -0,0 +1,113 @@
+"""
+Optional cross-encoder reranking for the RAG demos in 07-agent-rag.
+
+The retriever over-fetches candidates; a small CPU cross-encoder scores each
+(query, chunk) pair and only the best chunks that fit a prompt-token budget are
+kept. Backends, first available wins:
+    - fastembed `TextCrossEncoder` (ONNX Runtime, quantized MiniLM by default)
+    - sentence-transformers `CrossEncoder`
+Without either, reranking is a no-op that just applies top_n and the budget.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from rag_common.context_packer import count_tokens
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "Xenova/ms-marco-MiniLM-L-6-v2")
+ST_RERANK_MODEL = os.getenv("ST_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+
+class CrossEncoderReranker:
+    """Lazily loaded cross-encoder; `backend` is "fastembed", "sentence-transformers" or None."""
+
+    def __init__(self):
+        self.backend = None
+        self._model = None
+        try:
+            from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+            self._model = TextCrossEncoder(model_name=RERANK_MODEL)
+            self.backend = "fastembed"
+            return
+        except ImportError:
+            pass
+        try:
+            from sentence_transformers import CrossEncoder
+
+            self._model = CrossEncoder(ST_RERANK_MODEL, device="cpu")
+            self.backend = "sentence-transformers"
+        except ImportError:
+            print("⚠️ No cross-encoder backend installed (pip install fastembed); reranking disabled")
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        if self.backend == "fastembed":
+            return list(self._model.rerank(query, list(texts)))
+        if self.backend == "sentence-transformers":
+            return [float(s) for s in self._model.predict([(query, t) for t in texts])]
+        # Keep the retriever's order
+        return [-float(i) for i in range(len(texts))]
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Process-wide reranker (model weights are loaded once)."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
+
+
+def rerank_documents(query: str, documents: Sequence, top_n: int = 5, token_budget: int = 1500,
+                     baseline_k: int = None) -> Tuple[List, Dict]:
+    """
+    Reorder LangChain documents by cross-encoder score and keep the top_n that fit in `token_budget`.
+
+    `baseline_k` is how many chunks the prompt used to get without reranking; the
+    returned stats compare its token count with the kept chunks.
+
+    Returns:
+        (documents, stats): stats has candidates, kept, rerank_ms, tokens_before,
+        tokens_after and tokens_saved.
+    """
+    documents = list(documents)
+    baseline_k = baseline_k or len(documents)
+    start = time.perf_counter()
+    reranker = get_reranker()
+    scores = reranker.score(query, [d.page_content for d in documents]) if documents else []
+    ranked = [doc for _, doc in sorted(zip(scores, documents), key=lambda item: item[0], reverse=True)]
+    rerank_ms = (time.perf_counter() - start) * 1000
+
+    kept, used = [], 0
+    for doc in ranked:
+        if len(kept) >= top_n:
+            break
+        tokens = count_tokens(doc.page_content)
+        # Always keep the best chunk, even if it alone exceeds the budget
+        if kept and used + tokens > token_budget:
+            continue
+        kept.append(doc)
+        used += tokens
+
+    tokens_before = sum(count_tokens(d.page_content) for d in documents[:baseline_k])
+    return kept, {
+        "backend": reranker.backend,
+        "candidates": len(documents),
+        "kept": len(kept),
+        "rerank_ms": rerank_ms,
+        "tokens_before": tokens_before,
+        "tokens_after": used,
+        "tokens_saved": tokens_before - used,
+    }
+
+
+def format_rerank_stats(stats: Dict) -> str:
+    return (f"🎯 Reranked {stats['candidates']} → {stats['kept']} chunks in {stats['rerank_ms']:.0f} ms "
+            f"({stats['backend'] or 'no model'}); prompt context ~{stats['tokens_after']} tokens "
+            f"vs ~{stats['tokens_before']} without reranking, {stats['tokens_saved']} saved")